@@ -0,0 +1,225 @@
+import argparse
+import os
+import sys
+import tempfile
+import uuid
+from datetime import date
+from urllib.parse import quote
+
+from cache import cached_reader
+from storage.base import EXPENSE_FIELDS, to_epoch_day
+
+# 지난 달 소비 기록 보관(archive).
+# 화면은 거의 이번 달과 지난달(달력, 지난달 비교, 무지출 챌린지)만 보므로, 그보다 오래된 '닫힌 달'의 기록은
+# SQLite expenses 표에서 빼서 반/달별 Parquet 파일(zstd 압축)로 옮긴다. expenses 표와 인덱스가 작게 유지된다.
+# - 파일: ARCHIVE_DIR/class=<반>/month=<YYYY-MM>/part-<첫 id>-<마지막 id>-<임의 문자열>.parquet (학생, 날짜 순으로 정렬)
+#   id는 DB마다 따로 매기고 반을 옮기면(sharding.move_users) 새로 받으므로, 임의 문자열을 붙여 이름이 겹치지 않게 한다.
+# - 목록: 각 DB의 expense_archive 표에 학생의 어느 달이 어느 파일에 있는지 적는다. (migrations.py의 8번)
+#   월간 요약(expense_rollups)은 건드리지 않으며, rollups.py verify는 보관 파일의 합계까지 더해 맞춰 본다.
+# - 읽기: 소비 내역 페이지, 전체 기록, 분석용 열 묶음(database.py)이 보관된 달을 알아서 함께 읽는다.
+#   필요한 열만(projection), 그 학생과 그 위치 이전 줄만(predicate pushdown) 파일에서 읽는다.
+# 사용법: python archive.py run                (이번 달과 지난달만 남기고 보관)
+#         python archive.py run --keep-months 3
+# pyarrow가 필요하다. (requirements.txt)
+
+ARCHIVE_DIR = 'expense_archive'
+
+# SQLite에 남겨 둘 달 수 (이번 달 포함)
+KEEP_MONTHS = 2
+
+# 한 파일 안의 row group 크기. 학생 순으로 정렬해 두었으므로 큰 반에서는 다른 학생의 row group을 통계만 보고 건너뛴다.
+ROW_GROUP_SIZE = 4096
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('보관된 기록을 읽고 쓰려면 pyarrow가 필요해요. (pip install pyarrow)')
+    return pyarrow
+
+
+def _month_start(day, shift=0):
+    # day가 속한 달에서 shift달 옮긴 달의 1일
+    months = day.year * 12 + day.month - 1 + shift
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def cutoff_month(today, keep_months=KEEP_MONTHS):
+    # 이 달의 1일(date)보다 앞선 달은 닫힌 달이다.
+    return _month_start(today, 1 - keep_months)
+
+
+def _part_path(class_name, month, first_id, last_id):
+    # ARCHIVE_DIR 기준 상대 경로. 반 이름은 폴더 이름으로 쓸 수 있게 %로 바꾼다. (빈 반은 'class=')
+    # 다른 DB(샤드)의 같은 반/달/id 범위와 겹치지 않도록 임의 문자열을 붙인다.
+    return f"class={quote(class_name, safe='')}/month={month}/part-{first_id}-{last_id}-{uuid.uuid4().hex[:12]}.parquet"
+
+
+def _write_part(path, rows):
+    # rows: [(id, username, 'YYYY-MM-DD', item, price, category, type), ...] 학생, 날짜 순
+    pa = _pyarrow()
+    full_path = os.path.join(ARCHIVE_DIR, path)
+    columns = list(zip(*rows))
+    table = pa.table({
+        'id': pa.array(columns[0], pa.int64()),
+        'username': pa.array(columns[1], pa.string()),
+        'date': pa.array([date.fromisoformat(day) for day in columns[2]], pa.date32()),
+        'item': pa.array(columns[3], pa.string()),
+        'price': pa.array(columns[4], pa.int64()),
+        'category': pa.array(columns[5], pa.string()),
+        'type': pa.array(columns[6], pa.string()),
+    })
+    # 다 쓴 파일만 보이도록 임시 파일에 쓴 뒤 제 이름으로 링크한다.
+    # 다른 보관 목록이 가리키는 파일을 덮어쓰지 않도록, 같은 이름이 이미 있으면 FileExistsError로 멈춘다. (os.replace는 덮어쓴다)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(full_path), suffix='.tmp')
+    os.close(fd)
+    try:
+        pa.parquet.write_table(table, tmp, compression='zstd', row_group_size=ROW_GROUP_SIZE)
+        os.link(tmp, full_path)
+    finally:
+        os.unlink(tmp)
+
+
+ARCHIVE_SELECT = '''SELECT e.id, e.username, date(e.day * 86400, 'unixepoch'), e.item, e.price, cat.label, typ.label
+                    FROM expenses e
+                    LEFT JOIN users u ON u.username = e.username
+                    LEFT JOIN expense_categories cat ON cat.id = e.category_id
+                    LEFT JOIN expense_types typ ON typ.id = e.type_id
+                    WHERE COALESCE(u.class_name, '') = ? AND e.day BETWEEN ? AND ?
+                    ORDER BY e.username, e.day, e.id'''
+
+
+def archive_db(conn, today, keep_months=KEEP_MONTHS):
+    # 한 DB 파일의 닫힌 달 기록을 보관 파일로 옮기고 [(파일 경로, 줄 수), ...]를 돌려준다.
+    # (반, 달)마다 쓰기 잠금을 잡고 읽기 -> 파일 쓰기 -> 목록 추가 -> 기록 삭제를 한 트랜잭션으로 한다.
+    # 파일을 쓴 뒤 커밋 전에 멈추면 목록에 없는 파일만 남고 기록은 그대로이므로 다시 실행하면 된다.
+    cutoff = to_epoch_day(cutoff_month(today, keep_months))
+    groups = conn.execute('''SELECT DISTINCT COALESCE(u.class_name, ''), strftime('%Y-%m', e.day * 86400, 'unixepoch')
+                             FROM expenses e LEFT JOIN users u ON u.username = e.username
+                             WHERE e.day < ?''', (cutoff,)).fetchall()
+    conn.rollback()
+    written = []
+    for class_name, month in sorted(groups):
+        first = date.fromisoformat(f'{month}-01')
+        first_day, last_day = to_epoch_day(first), to_epoch_day(_month_start(first, 1)) - 1
+        c = conn.cursor()
+        c.execute('BEGIN IMMEDIATE')
+        rows = c.execute(ARCHIVE_SELECT, (class_name, first_day, last_day)).fetchall()
+        if not rows:
+            conn.rollback()
+            continue
+        path = _part_path(class_name, month, min(row[0] for row in rows), max(row[0] for row in rows))
+        _write_part(path, rows)
+        c.executemany('INSERT OR IGNORE INTO expense_archive (username, month, path) VALUES (?, ?, ?)',
+                      [(username, month, path) for username in sorted({row[1] for row in rows})])
+        c.executemany('DELETE FROM expenses WHERE id = ?', [(row[0],) for row in rows])
+        conn.commit()
+        written.append((path, len(rows)))
+    return written
+
+
+# --- 읽기 ---
+@cached_reader(lambda username, paths, columns: [])
+def read_archived(username, paths, columns):
+    # 보관 파일들(paths)에서 이 학생의 줄만 골라 columns 열만 읽은 pyarrow Table.
+    # 보관 파일은 한 번 쓰면 바뀌지 않으므로 데이터 버전 대신 파일 목록으로 캐시한다.
+    pa = _pyarrow()
+    dataset = pa.dataset.dataset([os.path.join(ARCHIVE_DIR, path) for path in paths], format='parquet')
+    return dataset.to_table(columns=list(columns), filter=pa.dataset.field('username') == username)
+
+
+def _page_rows(username, paths, after, limit, fields):
+    # 보관 파일에서 (date, id) 내림차순으로 after 다음 limit줄 (fields 순서의 튜플, date와 id를 포함해야 한다)
+    pa = _pyarrow()
+    field = pa.dataset.field
+    condition = field('username') == username
+    if after is not None:
+        day, row_id = date.fromisoformat(str(after[0])), int(after[1])
+        condition &= (field('date') < day) | ((field('date') == day) & (field('id') < row_id))
+    dataset = pa.dataset.dataset([os.path.join(ARCHIVE_DIR, path) for path in paths], format='parquet')
+    table = dataset.to_table(columns=list(fields), filter=condition)
+    table = table.sort_by([('date', 'descending'), ('id', 'descending')]).slice(0, limit)
+    return rows_of(table, fields)
+
+
+def archived_totals(c):
+    # 이 DB의 보관 목록에 있는 (학생, 파일)의 기록을 (username, month, category, type)별로 합한다. (rollups.py 검증용)
+    # 파일 하나에는 한 반의 한 달이 들어 있으므로, 다른 DB로 옮겨 간 학생의 줄은 그 학생이 있는 DB에서 센다.
+    pa = _pyarrow()
+    owners = {}
+    for username, month, path in c.execute('SELECT username, month, path FROM expense_archive').fetchall():
+        owners.setdefault((path, month), []).append(username)
+    totals = {}
+    for (path, month), usernames in owners.items():
+        table = pa.parquet.read_table(os.path.join(ARCHIVE_DIR, path), columns=['username', 'price', 'category', 'type'],
+                                      filters=[('username', 'in', usernames)])
+        grouped = table.group_by(['username', 'category', 'type'], use_threads=False).aggregate(
+            [('price', 'sum'), ([], 'count_all')])
+        for username, category, type_val, total, count in zip(*(grouped.column(name).to_pylist() for name in (
+                'username', 'category', 'type', 'price_sum', 'count_all'))):
+            totals[(username, month, category, type_val)] = (total or 0, count)
+    return totals
+
+
+def rows_of(table, fields=EXPENSE_FIELDS):
+    # pyarrow Table -> fields 순서의 튜플 목록 (날짜는 SQLite 저장소처럼 'YYYY-MM-DD' 문자열)
+    columns = [table.column(name).to_pylist() for name in fields]
+    if 'date' in fields:
+        position = fields.index('date')
+        columns[position] = [str(day) for day in columns[position]]
+    return list(zip(*columns))
+
+
+def merge_page(live_rows, parts, username, after, limit, fields=EXPENSE_FIELDS):
+    # SQLite에서 읽은 페이지(live_rows, (date, id) 내림차순 limit줄 이하)에 보관된 달의 줄을 합쳐 앞의 limit줄을 돌려준다.
+    # 줄은 fields 순서의 튜플이며 date와 id를 포함해야 한다.
+    # parts는 [(달, 파일 경로), ...] 달 내림차순. 달 하나씩 거슬러 읽고, limit줄이 찬 뒤 남은 달이 모두
+    # 지금 limit번째 줄보다 앞선 달이면 더 읽지 않는다. (첫 페이지들은 보통 파일을 하나도 열지 않는다)
+    rows = list(live_rows)
+    day, row_id = fields.index('date'), fields.index('id')
+    by_month = {}
+    for month, path in parts:
+        if after is None or month <= str(after[0])[:7]:
+            by_month.setdefault(month, []).append(path)
+    for month in sorted(by_month, reverse=True):
+        if len(rows) >= limit and rows[limit - 1][day][:7] > month:
+            break
+        rows.extend(_page_rows(username, by_month[month], after, limit, fields))
+        rows.sort(key=lambda row: (row[day], row[row_id]), reverse=True)
+    return rows[:limit]
+
+
+# --- 명령줄 ---
+def main(argv=None):
+    global ARCHIVE_DIR
+    import database
+
+    parser = argparse.ArgumentParser(description='닫힌 달의 소비 기록을 Parquet 파일로 보관')
+    parser.add_argument('command', choices=['run'])
+    parser.add_argument('--keep-months', type=int, default=KEEP_MONTHS, help='SQLite에 남길 달 수 (이번 달 포함, 기본 2)')
+    parser.add_argument('--db', default=database.DB_PATH, help='기본 DB 파일 경로 (반별 DB도 함께 보관한다)')
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR, help='보관 파일 폴더')
+    args = parser.parse_args(argv)
+    if args.keep_months < 1:
+        parser.error('--keep-months는 1 이상이어야 해요. (이번 달은 보관하지 않는다)')
+
+    ARCHIVE_DIR = args.archive_dir
+    database.DB_PATH = args.db
+    database.init_db()
+    today = date.today()
+    total = 0
+    for path in database.get_router().shards():
+        with database.get_connection(path) as conn:
+            for part, count in archive_db(conn, today, args.keep_months):
+                print(f'{path}: {part} {count}줄')
+                total += count
+    print(f'보관한 기록 {total}줄 ({cutoff_month(today, args.keep_months):%Y-%m} 이전)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
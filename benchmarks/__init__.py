@@ -0,0 +1,3 @@
+# 머니 매니저 성능 측정 도구.
+# 학교 규모의 가짜 데이터를 만들어 DB 함수, 로그인 화면이 처음 뜨는 시간, 앱 전체 재실행(rerun) 시간을 재고, 결과를 JSON으로 남긴다.
+# 사용법: python -m benchmarks --users 300 --expenses 200 --images 30 --out bench.json
@@ -0,0 +1,286 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# 저장소 최상위(streamlit_app.py가 있는 곳)를 import 경로에 넣는다.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import cache
+import database
+import image_store
+from benchmarks.seed import seed, usernames
+
+
+def percentile(samples, pct):
+    # 가장 가까운 순위(nearest-rank) 방식의 백분위수
+    ordered = sorted(samples)
+    # 위치 = ceil(pct% x n)번째. (pct * n을 먼저 곱해야 0.99 * 100 같은 부동소수점 오차로 한 칸 밀리지 않는다)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    ms = [s * 1000 for s in samples]
+    return {
+        'n': len(ms),
+        'mean_ms': round(sum(ms) / len(ms), 3),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+    }
+
+
+def time_calls(func, args_list):
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def bench_helpers(names, iterations, rng):
+    # DB 함수 하나하나의 시간을 잰다. 캐시를 거치지 않은 값(DB 조회 자체)과 캐시를 거친 값을 따로 남긴다.
+    results = {}
+    users = [(rng.choice(names),) for _ in range(iterations)]
+    today = date.today()
+    readers = {
+        'get_user_stats': lambda u: database.get_user_stats(u),
+        'get_expenses_db': lambda u: database.get_expenses_db(u),
+        'get_expense_page': lambda u: database.get_expense_page(u),
+        'get_expense_columns': lambda u: database.get_expense_columns(u),
+        'get_spending_summary': lambda u: database.get_spending_summary(u),
+        'get_wishlist_db': lambda u: database.get_wishlist_db(u),
+        'get_leaderboard': lambda u: database.get_leaderboard(database.get_user_class(u)),
+        'get_my_rank': lambda u: database.get_my_rank(u, database.get_user_class(u)),
+    }
+    for name, call in readers.items():
+        func = getattr(database, name)
+        uncached = getattr(func, 'uncached', func)
+        original = getattr(database, name)
+        setattr(database, name, uncached)
+        try:
+            results[name] = time_calls(call, users)
+        finally:
+            setattr(database, name, original)
+        call(users[0][0])
+        results[name + '[cached]'] = time_calls(call, [users[0]] * iterations)
+
+    results['update_user_activity'] = time_calls(database.update_user_activity, users)
+    results['add_expense_db'] = time_calls(
+        database.add_expense_db,
+        [(u, today, "벤치마크", 1000, database.EXPENSE_CATEGORIES[0], database.EXPENSE_TYPES[0]) for (u,) in users],
+    )
+    return results
+
+
+def _pandas_month_report(df, today, month_start, month_end, prev_start, prev_end):
+    # 예전 Tab 1/Tab 2 방식: 전체 기록 DataFrame의 이름을 바꾸고 날짜를 해석한 뒤 불리언 마스크로 거른다.
+    import pandas as pd
+
+    df = df.rename(columns={'date': '날짜', 'price': '금액', 'category': '종류', 'type': '유형'})
+    df['날짜'] = pd.to_datetime(df['날짜'])
+    this_month = df[(df['날짜'].dt.year == month_start.year) & (df['날짜'].dt.month == month_start.month)]
+    daily = this_month.groupby(this_month['날짜'].dt.date)['금액'].sum().to_dict()
+    prev = df[(df['날짜'].dt.year == prev_start.year) & (df['날짜'].dt.month == prev_start.month)]
+    streak, check_date = 0, today
+    while df[df['날짜'].dt.date == check_date]['금액'].sum() == 0:
+        streak += 1
+        check_date -= timedelta(days=1)
+        if streak > 30:
+            break
+    by_category = df.groupby('종류')['금액'].sum()
+    by_type = df.groupby('유형')['금액'].sum()
+    by_month = df.pivot_table(index=df['날짜'].dt.strftime('%Y-%m'), columns='종류', values='금액', aggfunc='sum', fill_value=0)
+    return daily, this_month['금액'].sum(), prev['금액'].sum(), streak, by_category, by_type, by_month
+
+
+def _columns_month_report(columns, today, month_start, month_end, prev_start, prev_end):
+    # 지금 방식: 분석용 열 묶음(expense_columns.py)에서 같은 값을 계산한다. (달력, 지난달 비교, 무지출 연속 기록, AI 코치 지표)
+    import coach
+
+    return (columns.daily_totals(month_start, month_end), columns.range_total(month_start, month_end),
+            columns.range_total(prev_start, prev_end), columns.no_spend_streak(today),
+            coach.compute_metrics(columns, month_start.strftime('%Y-%m')))
+
+
+def bench_analytics(names, iterations, rng):
+    # 달력/지난달 비교/무지출 연속 기록/AI 코치 지표를 예전 pandas 방식과 열 묶음 방식으로 각각 계산해 비교한다.
+    # [build]는 DB에서 읽어 DataFrame 또는 열 묶음을 만드는 시간까지, [cached]는 데이터가 그대로인 재실행처럼 계산만 잰다.
+    today = date.today()
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    prev_end = month_start - timedelta(days=1)
+    window = (today, month_start, month_end, prev_end.replace(day=1), prev_end)
+    users = [rng.choice(names) for _ in range(iterations)]
+    frames = {u: database.get_expenses_db.uncached(u) for u in set(users)}
+    columns = {u: database.get_expense_columns.uncached(u) for u in set(users)}
+    return {
+        'analytics:pandas[build]': time_calls(
+            lambda u: _pandas_month_report(database.get_expenses_db.uncached(u), *window), [(u,) for u in users]),
+        'analytics:pandas[cached]': time_calls(
+            lambda u: _pandas_month_report(frames[u], *window), [(u,) for u in users]),
+        'analytics:columns[build]': time_calls(
+            lambda u: _columns_month_report(database.get_expense_columns.uncached(u), *window), [(u,) for u in users]),
+        'analytics:columns[cached]': time_calls(
+            lambda u: _columns_month_report(columns[u], *window), [(u,) for u in users]),
+    }
+
+
+def bench_reruns(username, reruns):
+    # Streamlit AppTest로 브라우저 없이 앱을 돌려, 로그인한 학생의 화면별 전체 재실행 시간을 잰다.
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    at = AppTest.from_file(os.path.join(ROOT, 'streamlit_app.py'), default_timeout=120).run()
+    at.text_input[0].input(username)
+    at.text_input[1].input('1234')
+    at.button[0].click().run()
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"앱 실행 중 오류: {at.exception}")
+    sections = at.radio(key='section').options
+    for section in sections:
+        at.radio(key='section').set_value(section).run()
+        samples = []
+        for _ in range(reruns):
+            started = time.perf_counter()
+            at.run()
+            samples.append(time.perf_counter() - started)
+            if at.exception:
+                raise RuntimeError(f"{section} 화면 실행 중 오류: {at.exception}")
+        results[f'rerun:{section}'] = summarize(samples)
+    return results
+
+
+# 새 파이썬 프로세스에서 로그인 화면을 한 번 그리고 걸린 시간과 불러온 무거운 라이브러리를 JSON으로 출력한다.
+COLD_START_SCRIPT = '''
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+at = AppTest.from_file(sys.argv[2], default_timeout=120).run()
+elapsed = time.perf_counter() - started
+import profiling
+print(json.dumps({
+    'error': str(at.exception) if at.exception else None,
+    'seconds': elapsed,
+    'startup': profiling.startup_stats(),
+    'heavy_modules': [m for m in ('pandas', 'numpy', 'plotly.express', 'pyarrow') if m in sys.modules],
+}))
+'''
+
+
+def bench_cold_start(samples):
+    # 서버를 새로 띄운 직후처럼 import 캐시가 빈 프로세스에서 로그인 화면이 처음 그려질 때까지의 시간을 잰다.
+    # 프로세스마다 한 번씩이라 samples개의 프로세스를 차례로 띄운다. (측정용 DB는 MONEY_MANAGER_STORAGE로 넘긴다)
+    env = dict(os.environ, MONEY_MANAGER_STORAGE=f'sqlite:///{database.DB_PATH}')
+    seconds = []
+    startup = []
+    for _ in range(samples):
+        proc = subprocess.run([sys.executable, '-c', COLD_START_SCRIPT, ROOT, os.path.join(ROOT, 'streamlit_app.py')],
+                              capture_output=True, text=True, env=env, check=True)
+        run = json.loads(proc.stdout.strip().splitlines()[-1])
+        if run['error']:
+            raise RuntimeError(f"로그인 화면 실행 중 오류: {run['error']}")
+        seconds.append(run['seconds'])
+        startup.append(run['startup'])
+    result = summarize(seconds)
+    for name in ('imports', 'login_form'):
+        result[f'{name}_p50_ms'] = round(percentile([s[name] for s in startup], 50), 3)
+    result['heavy_modules'] = run['heavy_modules']
+    return {'cold_start:login_form': result}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='머니 매니저 성능 측정')
+    parser.add_argument('--users', type=int, default=300, help='가짜 학생 수')
+    parser.add_argument('--expenses', type=int, default=200, help='학생 1명당 소비 기록 수')
+    parser.add_argument('--images', type=int, default=30, help='위시리스트 사진을 올린 학생 수')
+    parser.add_argument('--classes', type=int, default=10, help='반 개수')
+    parser.add_argument('--iterations', type=int, default=200, help='DB 함수별 호출 횟수')
+    parser.add_argument('--reruns', type=int, default=20, help='화면별 재실행 횟수')
+    parser.add_argument('--cold-starts', type=int, default=5, help='첫 화면 시간을 잴 새 프로세스 수')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-app', action='store_true', help='앱 재실행 측정은 건너뛰기')
+    parser.add_argument('--out', help='결과 JSON 파일 (없으면 화면에 출력)')
+    parser.add_argument('--keep', action='store_true', help='측정에 쓴 임시 DB 폴더를 지우지 않기')
+    args = parser.parse_args(argv)
+
+    out_path = os.path.abspath(args.out) if args.out else None
+    workdir = tempfile.mkdtemp(prefix='money_manager_bench_')
+    os.chdir(workdir)
+    database.DB_PATH = os.path.join(workdir, 'money_manager.db')
+    image_store.IMAGE_DIR = os.path.join(workdir, 'wishlist_images')
+
+    try:
+        started = time.perf_counter()
+        seed(args.users, args.expenses, args.images, args.classes, seed=args.seed)
+        seed_seconds = time.perf_counter() - started
+
+        rng = random.Random(args.seed)
+        names = usernames(args.users)
+        results = bench_helpers(names, args.iterations, rng)
+        results.update(bench_analytics(names, args.iterations, rng))
+        if not args.skip_app:
+            results.update(bench_cold_start(args.cold_starts))
+            results.update(bench_reruns(names[0], args.reruns))
+    finally:
+        database.get_pool().close_all()
+        os.chdir(ROOT)
+        if args.keep:
+            print(f'측정용 DB: {workdir}', file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'users': args.users,
+            'expenses_per_user': args.expenses,
+            'images': args.images,
+            'classes': args.classes,
+            'iterations': args.iterations,
+            'reruns': args.reruns,
+            'cold_starts': args.cold_starts,
+            'seed': args.seed,
+            'seed_seconds': round(seed_seconds, 3),
+            'db_pool': database.pool_stats(),
+            'cache': cache.cache_stats(),
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if out_path:
+        with open(out_path, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
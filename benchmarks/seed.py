@@ -0,0 +1,57 @@
+import io
+import random
+from datetime import date, timedelta
+
+import database
+
+# 학교 규모의 가짜 데이터 만들기.
+# 같은 seed 값이면 언제나 같은 데이터가 만들어지므로 측정 결과를 서로 비교할 수 있다.
+
+ITEMS = ["떡볶이", "컵라면", "공책", "연필", "버스비", "스티커", "젤리", "보드게임", "아이스크림", "색연필"]
+
+
+def _fake_image(rng, size=(1200, 900)):
+    # 위시리스트용 단색 사진 (Pillow가 없으면 사진 없이 만든다)
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    color = tuple(rng.randrange(256) for _ in range(3))
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, format='PNG')
+    return out.getvalue()
+
+
+def usernames(users):
+    return [f"학생{i:04d}" for i in range(users)]
+
+
+def seed(users=300, expenses_per_user=200, images=30, classes=10, days=365, seed=42):
+    # 현재 database.DB_PATH에 가짜 학생, 소비 기록, 위시리스트 사진을 채운다.
+    # 실제 앱과 같은 쓰기 경로(login_user, add_expenses_bulk, add_wishlist_db)를 쓰므로 요약/랭킹도 함께 채워진다.
+    rng = random.Random(seed)
+    database.init_db()
+    names = usernames(users)
+    for i, username in enumerate(names):
+        database.login_user(username, '1234', f"{i % classes + 1}반")
+
+    today = date.today()
+    chunk = []
+    for username in names:
+        for _ in range(expenses_per_user):
+            chunk.append((
+                username,
+                today - timedelta(days=rng.randrange(days)),
+                rng.choice(ITEMS),
+                rng.randrange(5, 300) * 100,
+                rng.choice(database.EXPENSE_CATEGORIES),
+                rng.choice(database.EXPENSE_TYPES),
+            ))
+            if len(chunk) >= 5000:
+                database.add_expenses_bulk(chunk)
+                chunk = []
+    database.add_expenses_bulk(chunk)
+
+    for username in names[:images]:
+        database.add_wishlist_db(username, "자전거", rng.randrange(10, 300) * 1000, _fake_image(rng))
+    return names
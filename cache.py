@@ -0,0 +1,145 @@
+import sys
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+# 읽기 함수 결과 캐시.
+# 위젯을 하나 누를 때마다 스크립트 전체가 다시 실행되므로, 데이터가 바뀌지 않았다면 같은 조회를 반복하지 않는다.
+# 캐시 키에는 사용자별 '데이터 버전'이 들어가고, 쓰기 함수가 버전을 올리면 이전 결과는 더 이상 쓰이지 않는다.
+# (버전은 이 서버 프로세스 안에서만 유지된다. Streamlit 서버는 한 프로세스에서 모든 세션을 처리한다.)
+
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# 여러 사용자의 포인트에 함께 영향을 받는 랭킹은 별도의 버전 범위를 쓴다.
+LEADERBOARD_SCOPE = '__leaderboard__'
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def get_data_version(scope):
+    with _versions_lock:
+        return _versions.get(scope, 0)
+
+
+def bump_data_version(*scopes):
+    # 쓰기가 끝난 뒤 호출한다. 해당 범위의 캐시된 결과는 다음 조회 때 새로 계산된다.
+    with _versions_lock:
+        for scope in scopes:
+            _versions[scope] = _versions.get(scope, 0) + 1
+
+
+def _sizeof(value):
+    # 캐시 메모리 상한을 지키기 위한 대략적인 크기 계산
+    if hasattr(value, 'memory_usage'):  # pandas DataFrame
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if hasattr(value, 'nbytes'):  # numpy 배열, 분석용 열 묶음(expense_columns.py)
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    # 전체 크기가 max_bytes를 넘으면 가장 오래 안 쓴 항목부터 버리는 캐시
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value):
+        size = _sizeof(value)
+        with self._lock:
+            if key in self._items:
+                self.bytes -= self._items.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._items[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, old_size) = self._items.popitem(last=False)
+                self.bytes -= old_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._items),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+_cache = LRUCache()
+
+
+def _hashable(value):
+    # 목록으로 넘긴 인자(예: columns=['date', 'price'])도 캐시 키로 쓸 수 있게 튜플로 바꾼다.
+    return tuple(value) if isinstance(value, list) else value
+
+
+def cached_reader(scopes):
+    # 읽기 함수용 데코레이터. scopes(*args, **kwargs)는 결과가 의존하는 버전 범위 목록을 돌려준다.
+    # 예) @cached_reader(lambda username: [username])
+    # 캐시된 DataFrame/사전은 여러 세션이 함께 쓰므로 호출한 쪽에서 제자리 수정하면 안 된다.
+    def decorator(func):
+        def make_key(args, kwargs):
+            versions = tuple((scope, get_data_version(scope)) for scope in scopes(*args, **kwargs))
+            args = tuple(_hashable(value) for value in args)
+            kwargs = tuple(sorted((name, _hashable(value)) for name, value in kwargs.items()))
+            return (func.__name__, args, kwargs, versions)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            found, value = _cache.get(key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            _cache.put(key, value)
+            return value
+
+        def prime(value, *args, **kwargs):
+            # 쓰기 함수가 이미 새 값을 알고 있을 때, 다시 조회하지 않도록 현재 버전의 캐시에 넣어 둔다.
+            # 버전을 올린 뒤에 호출해야 한다.
+            _cache.put(make_key(args, kwargs), value)
+
+        wrapper.uncached = func
+        wrapper.prime = prime
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,43 @@
+import calendar
+from datetime import date
+
+import profiling
+from cache import cached_reader
+from database import get_expense_columns
+
+# 마이 데이터 보드(Tab 1)의 월간 캘린더.
+# 예전에는 주마다 st.columns(7)을 만들고 날짜 칸마다 st.markdown을 불러 한 달에 50개 가까운 요소를 보냈다.
+# 이제 한 달 전체를 HTML 한 덩어리(CSS grid)로 만들어 st.markdown 한 번으로 그리고,
+# 만든 HTML은 (사용자, 연, 월, 오늘 날짜, 데이터 버전)별로 캐시한다. 스타일(.mm-calendar)은 static/money_manager.css에 있다.
+
+WEEKDAYS = ["월", "화", "수", "목", "금", "토", "일"]
+
+
+def _day_cell(day, spent, is_past):
+    # 소비가 있는 날은 금액을, 지난 날 중 소비가 없는 날은 '돼지 아이콘'(무지출 도장)을 표시한다.
+    content = f"<div class='day-num'>{day}</div>"
+    if spent > 0:
+        content += f"<div class='expense-text'>💸 -{spent:,}</div>"
+    elif is_past:
+        content += "<div class='good-job'>🐷</div>"
+    return f"<div class='day-box'>{content}</div>"
+
+
+@cached_reader(lambda username, year, month, today: [username])
+@profiling.timed('calendar.month_calendar_html', rows=lambda result: 0)
+def month_calendar_html(username, year, month, today):
+    # 한 달 달력을 HTML 문자열 하나로 돌려준다. st.markdown(..., unsafe_allow_html=True)로 그린다.
+    # today는 무지출 도장을 어디까지 찍을지 정하며, 날짜가 바뀌면 캐시 키도 바뀐다.
+    month_start = date(year, month, 1)
+    month_end = date(year, month, calendar.monthrange(year, month)[1])
+    daily_totals = get_expense_columns(username).daily_totals(month_start, month_end)
+
+    cells = [f"<div class='weekday'>{name}</div>" for name in WEEKDAYS]
+    for week in calendar.monthcalendar(year, month):
+        for day in week:
+            if day == 0:
+                cells.append("<div class='day-box empty'></div>")
+            else:
+                current_date = date(year, month, day)
+                cells.append(_day_cell(day, daily_totals.get(current_date, 0), current_date <= today))
+    return "<div class='mm-calendar'>" + "".join(cells) + "</div>"
@@ -0,0 +1,29 @@
+import plotly.express as px
+
+import profiling
+from cache import cached_reader
+from database import get_spending_summary
+
+# 마이 데이터 보드(Tab 1)의 도넛/막대 차트.
+# 차트는 월간 요약 테이블의 종류/유형별 합계 몇 줄로 만들고, 만든 Figure는 사용자 데이터 버전별로 캐시한다.
+# 색 고르기나 달력 연/월 선택처럼 데이터와 상관없는 재실행에서는 px.pie/px.bar(각 30ms 안팎)를 다시 부르지 않는다.
+# 캐시된 Figure는 여러 세션이 함께 쓰므로 꺼내 쓴 쪽에서 update_layout 등으로 고치면 안 된다.
+
+NEED_WANT_COLORS = {"필요해요 (Need) ✅": "#4CAF50", "원해요 (Want) 💖": "#FF9800"}
+
+
+@cached_reader(lambda username: [username])
+@profiling.timed('chart.spending_charts', rows=lambda result: 0)
+def spending_charts(username):
+    # (종류별 도넛 차트, Need/Want 막대 차트)를 돌려준다. 기록이 없으면 (None, None)
+    df_summary = get_spending_summary(username)
+    if df_summary.empty:
+        return None, None
+    df_summary = df_summary.rename(columns={'total': '금액', 'category': '종류', 'type': '유형'})
+    df_category = df_summary.groupby("종류", as_index=False, sort=False)["금액"].sum()
+    df_type = df_summary.groupby("유형", as_index=False, sort=False)["금액"].sum()
+    # 어떤 종류(간식 등)에 돈이 편중되었는지 보여주는 도넛 차트
+    fig_pie = px.pie(df_category, values="금액", names="종류", hole=0.4, color_discrete_sequence=px.colors.qualitative.Pastel)
+    # Need와 Want의 비율을 비교하는 막대 차트
+    fig_bar = px.bar(df_type, x="유형", y="금액", color="유형", text_auto=True, color_discrete_map=NEED_WANT_COLORS)
+    return fig_pie, fig_bar
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from cache import cached_reader
+from database import EXPENSE_CATEGORIES, EXPENSE_TYPES, get_expense_columns
+from expense_columns import month_number
+
+# AI 머니 코치(Tab 2)의 규칙 엔진.
+# 규칙은 coach_rules.json에 적어 두고(선생님이 코드를 고치지 않고 바꿀 수 있다),
+# 분석용 열 묶음(expense_columns.py)에서 지표(종류별 비율, Need/Want 비율, 지난달 대비 변화, 종류별 급증)를
+# bincount 몇 번으로 한 번에 계산한 뒤 모든 규칙의 조건을 numpy 배열 연산 한 번으로 판정한다.
+# 열 묶음은 달력과 함께 쓰는 것이라 데이터 버전마다 한 번만 만들어진다.
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'coach_rules.json')
+
+# 규칙에서 쓸 수 있는 지표와, key에 올 수 있는 값
+METRICS = {
+    'category_share': EXPENSE_CATEGORIES,  # 전체 지출 중 이 종류의 비율(%)
+    'type_share': EXPENSE_TYPES,           # 전체 지출 중 이 유형의 비율(%)
+    'month_change_pct': [''],              # 이번 달 지출이 지난달보다 몇 % 늘었나 (지난달 기록이 없으면 값 없음)
+    'category_spike': EXPENSE_CATEGORIES,  # 이번 달 이 종류 지출 / 지난 달들의 한 달 평균 (배)
+}
+
+OPERATORS = ('>', '>=', '<', '<=', '==', '!=')
+LEVELS = ('success', 'info', 'warning', 'error')
+
+_rules_lock = threading.Lock()
+_rules_cache = {}  # path -> (수정 시각, 규칙 표)
+
+
+def _check_outcome(rule_id, outcome):
+    if outcome is None:
+        return None
+    if outcome.get('level') not in LEVELS or not outcome.get('message'):
+        raise ValueError(f"코치 규칙 {rule_id!r}: level은 {LEVELS} 중 하나이고 message가 있어야 해요.")
+    return outcome['level'], outcome['message']
+
+
+def parse_rules(config):
+    # 설정(사전)을 검사해 규칙 표(DataFrame)로 바꾼다. key가 '*'인 규칙은 가능한 모든 key로 펼친다.
+    # 잘못된 규칙은 ValueError. (예전 간식 규칙처럼 존재하지 않는 종류 이름을 조용히 비교하는 일이 없게 한다)
+    rows = []
+    for order, rule in enumerate(config.get('rules', [])):
+        rule_id = rule.get('id', f'#{order}')
+        metric = rule.get('metric')
+        if metric not in METRICS:
+            raise ValueError(f"코치 규칙 {rule_id!r}: 알 수 없는 지표 {metric!r}")
+        key = rule.get('key', '')
+        if key != '*' and key not in METRICS[metric]:
+            raise ValueError(f"코치 규칙 {rule_id!r}: {metric}에 없는 key {key!r} (가능: {METRICS[metric]})")
+        if rule.get('op') not in OPERATORS:
+            raise ValueError(f"코치 규칙 {rule_id!r}: 알 수 없는 비교 {rule.get('op')!r}")
+        threshold = rule.get('threshold')
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)):
+            raise ValueError(f"코치 규칙 {rule_id!r}: threshold는 숫자여야 해요. (지금: {threshold!r})")
+        then = _check_outcome(rule_id, rule.get('then'))
+        otherwise = _check_outcome(rule_id, rule.get('else'))
+        for k in (METRICS[metric] if key == '*' else [key]):
+            rows.append({'order': order, 'id': rule_id, 'metric': metric, 'key': k, 'op': rule['op'],
+                         'threshold': float(threshold), 'then': then, 'else': otherwise})
+    return pd.DataFrame(rows, columns=['order', 'id', 'metric', 'key', 'op', 'threshold', 'then', 'else'])
+
+
+def load_rules(path=RULES_PATH):
+    # 규칙 파일을 읽는다. 파일이 바뀌면(수정 시각) 다음 분석 때 다시 읽는다.
+    mtime = os.path.getmtime(path)
+    with _rules_lock:
+        cached = _rules_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, encoding='utf-8') as f:
+        rules = parse_rules(json.load(f))
+    with _rules_lock:
+        _rules_cache[path] = (mtime, rules)
+    return rules
+
+
+def compute_metrics(columns, current_month):
+    # 분석용 열 묶음 -> 지표 표 (metric, key, value)
+    # 모든 계산은 종류/유형/달 단위 합계(bincount)에 대한 numpy 연산이다.
+    total = columns.total
+    by_category = columns.totals_by_category(EXPENSE_CATEGORIES)
+    by_type = columns.totals_by_type(EXPENSE_TYPES)
+    share_base = total if total > 0 else np.nan
+
+    # 달 x 종류 합계표 (기록이 있는 달만, 달 오름차순). 이번 달과 지난 달(들)을 나눠 지난달 대비 변화와 종류별 급증을 계산한다.
+    months, by_month = columns.monthly_totals_by_category(EXPENSE_CATEGORIES)
+    month_totals = by_month.sum(axis=1)
+    current = month_number(current_month)
+    position = int(np.searchsorted(months, current))
+    has_current = position < len(months) and months[position] == current
+    this_month = by_month[position] if has_current else np.zeros(len(EXPENSE_CATEGORIES), dtype=np.int64)
+    earlier = by_month[:position]
+
+    prev_total = month_totals[months == current - 1].sum()
+    change_pct = (this_month.sum() - prev_total) / prev_total * 100 if prev_total > 0 else np.nan
+
+    usual = earlier.mean(axis=0) if len(earlier) else np.full(len(EXPENSE_CATEGORIES), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spike = np.where(this_month > 0, this_month / np.where(usual > 0, usual, np.nan), np.nan)
+
+    parts = [
+        ('category_share', EXPENSE_CATEGORIES, by_category / share_base * 100),
+        ('type_share', EXPENSE_TYPES, by_type / share_base * 100),
+        ('month_change_pct', [''], [change_pct]),
+        ('category_spike', EXPENSE_CATEGORIES, spike),
+    ]
+    # 표는 한 번에 만든다. (작은 DataFrame 여러 개를 concat하면 계산보다 표 만드는 데 시간이 더 든다)
+    return pd.DataFrame({
+        'metric': [metric for metric, keys, _ in parts for _ in keys],
+        'key': [key for _, keys, _ in parts for key in keys],
+        'value': np.concatenate([np.asarray(values, dtype=float) for _, _, values in parts]),
+    })
+
+
+def evaluate(rules, metrics):
+    # 모든 규칙을 한 번에 판정해 [(level, message), ...]를 규칙 순서대로 돌려준다.
+    table = rules.merge(metrics, on=['metric', 'key'], how='left')  # how='left'는 규칙 순서를 그대로 둔다.
+    value = table['value'].to_numpy(dtype=float)
+    threshold = table['threshold'].to_numpy(dtype=float)
+    op = table['op'].to_numpy()
+    with np.errstate(invalid='ignore'):
+        hit = np.select(
+            [op == '>', op == '>=', op == '<', op == '<=', op == '==', op == '!='],
+            [value > threshold, value >= threshold, value < threshold, value <= threshold,
+             value == threshold, value != threshold],
+        )
+    known = ~np.isnan(value)
+
+    feedback = []
+    for outcome_then, outcome_else, key, v, is_hit, is_known in zip(
+            table['then'], table['else'], table['key'], value, hit, known):
+        outcome = outcome_then if is_hit else outcome_else
+        if is_known and outcome is not None:
+            level, message = outcome
+            # {abs_value}는 부호 없는 값 ("지난달보다 25% 덜 썼어요"처럼 문장이 방향을 말할 때)
+            feedback.append((level, message.format(value=v, abs_value=abs(v), key=key)))
+    return feedback
+
+
+@cached_reader(lambda username, current_month, rules_mtime: [username])
+@profiling.timed('coach.analyze', rows=lambda result: 0)
+def _analyze(username, current_month, rules_mtime):
+    columns = get_expense_columns(username)
+    if not len(columns):
+        return 0, []
+    return columns.total, evaluate(load_rules(), compute_metrics(columns, current_month))
+
+
+def analyze(username, current_month):
+    # (총 소비, [(level, message), ...])를 돌려준다. current_month는 'YYYY-MM'
+    # 결과는 (사용자 데이터 버전, 규칙 파일 수정 시각)별로 캐시된다.
+    return _analyze(username, current_month, os.path.getmtime(RULES_PATH))
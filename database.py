@@ -0,0 +1,485 @@
+import os
+import threading
+from functools import wraps
+import heapq
+from datetime import datetime
+from itertools import islice
+
+import image_store
+from cache import cached_reader, bump_data_version, clear_cache, LEADERBOARD_SCOPE
+from leaderboard import Leaderboard, SCHOOL
+from sharding import ShardRouter, move_users, set_user_class
+from storage import EXPENSE_FIELDS, SQLiteStorage, UserNotFound, open_storage
+from storage.base import EXPENSE_CATEGORIES, EXPENSE_TYPES
+from storage.sqlite import get_pool as _get_pool
+import profiling
+
+# 머니 매니저의 데이터 계층.
+# Streamlit은 위젯을 누를 때마다 스크립트 전체를 다시 실행하므로, 이 모듈은 한 번만 import되어
+# 서버 프로세스가 살아있는 동안 DB 연결을 재사용한다.
+# 반별로 DB 파일을 나눌 수 있으며(sharding.py), 사용자 데이터 함수는 닉네임으로 그 학생의 DB를 찾아 쓴다.
+# 실제 읽기/쓰기는 저장소(storage/)가 맡고, 여기서는 캐시, 랭킹, 샤드 찾기, 계측과 DataFrame 변환을 한다.
+
+DB_PATH = 'money_manager.db'
+
+# 소비 기록 입력 폼의 선택지(EXPENSE_CATEGORIES, EXPENSE_TYPES)는 저장소가 코드 표를 만들 때도 쓰므로 storage/base.py에 있다.
+
+
+# --- 저장소 ---
+# 저장소 주소 (storage/__init__.py의 open_storage). 비워 두면 DB_PATH의 SQLite 파일을 쓰고, 반별 샤드도 쓸 수 있다.
+# memory:// 나 postgresql://... 를 주면 모든 학생을 그 저장소 하나에 저장한다. (반별 샤드는 SQLite에서만 쓴다)
+STORAGE_URL = os.environ.get('MONEY_MANAGER_STORAGE', '')
+if STORAGE_URL.startswith('sqlite:///'):
+    DB_PATH = STORAGE_URL[len('sqlite:///'):]
+
+_storage = None  # SQLite가 아닌 저장소 (init_db()가 열거나 use_storage()로 바꿔 끼운다)
+_storages = {}   # SQLite 파일 경로 -> SQLiteStorage
+_storages_lock = threading.Lock()
+
+
+def get_pool(path=None):
+    # DB 파일 경로마다 하나의 풀을 만들어 프로세스 전체에서 공유한다.
+    return _get_pool(path or DB_PATH)
+
+
+def get_connection(path=None):
+    # `with get_connection() as conn:` 형태로 쓰면 블록이 끝날 때 연결이 풀로 돌아간다.
+    return get_pool(path).connection()
+
+
+def pool_stats(path=None):
+    # 새로 연 연결 수와 재사용한 연결 수를 돌려준다. (성능 점검용)
+    return get_pool(path).stats()
+
+
+# --- 샤드(반별 DB) 찾기 ---
+_router = ShardRouter(lambda: DB_PATH)
+_prepared_shards = set()
+_prepared_lock = threading.Lock()
+
+
+def get_router():
+    return _router
+
+
+def _storage_for(path):
+    # SQLite 파일마다 저장소 하나 (연결 풀을 함께 쓴다)
+    with _storages_lock:
+        storage = _storages.get(path)
+        if storage is None:
+            storage = _storages[path] = SQLiteStorage(path)
+        return storage
+
+
+def prepare_shard(path):
+    # 처음 쓰는 샤드 파일이면 테이블을 만든다. (프로세스마다 한 번)
+    with _prepared_lock:
+        if path in _prepared_shards:
+            return
+        _storage_for(path).migrate()
+        _prepared_shards.add(path)
+
+
+def _user_storage(username):
+    # 이 학생의 기록이 있는 저장소
+    return _storage or _storage_for(_router.shard_of_user(username))
+
+
+def _class_storage(class_name):
+    return _storage or _storage_for(_router.shard_of_class(class_name))
+
+
+def _all_storages():
+    if _storage is not None:
+        return [_storage]
+    return [_storage_for(path) for path in _router.shards()]
+
+
+def _retry_on_move(func):
+    # 쓰는 도중 학생이 다른 샤드로 옮겨졌으면(UserNotFound) 디렉터리를 다시 읽고 한 번 더 시도한다.
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except UserNotFound:
+            _router.reload()
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# 저장소(샤드)마다 하나씩, 프로세스 전체에서 공유하는 반별 랭킹 (처음 조회할 때 DB에서 불러온다)
+_leaderboards = {}
+_leaderboards_lock = threading.Lock()
+
+
+def _on_leaderboard_reload():
+    # 랭킹을 DB에서 다시 불러왔으면 그 전에 캐시한 get_leaderboard 결과는 버린다.
+    bump_data_version(LEADERBOARD_SCOPE)
+
+
+def _leaderboard_scopes(*args, **kwargs):
+    # 캐시 키를 만들기 전에 랭킹마다 다시 불러올 때가 됐는지 확인한다. (불러오면 버전이 올라 캐시를 건너뛴다)
+    # 그래서 다른 프로세스가 바꾼 포인트도 캐시된 get_leaderboard 결과에 RELOAD_SECONDS 안에 보인다.
+    with _leaderboards_lock:
+        boards = list(_leaderboards.values())
+    for board in boards:
+        board.refresh()
+    return [LEADERBOARD_SCOPE]
+
+
+def _leaderboard_for(storage):
+    with _leaderboards_lock:
+        board = _leaderboards.get(storage)
+        if board is None:
+            board = _leaderboards[storage] = Leaderboard(storage.leaderboard_rows, on_reload=_on_leaderboard_reload)
+        return board
+
+
+def _user_leaderboard(username):
+    return _leaderboard_for(_user_storage(username))
+
+
+def _on_directory_change():
+    # 반이 다른 샤드로 옮겨지면 샤드별 랭킹을 모두 다시 불러온다.
+    with _leaderboards_lock:
+        boards = list(_leaderboards.values())
+    for board in boards:
+        board.invalidate()
+    bump_data_version(LEADERBOARD_SCOPE)
+
+
+_router.on_change(_on_directory_change)
+
+
+def use_storage(storage):
+    # 저장소를 바꿔 끼운다. (테스트에서 MemoryStorage를 쓸 때 등) None이면 DB_PATH의 SQLite로 돌아간다.
+    # 이전 저장소에서 읽은 캐시와 랭킹은 버린다.
+    global _storage
+    if storage is not None:
+        storage.migrate()
+    _storage = storage
+    with _leaderboards_lock:
+        _leaderboards.clear()
+    _known_parts.clear()
+    clear_cache()
+    bump_data_version(LEADERBOARD_SCOPE)
+
+
+# --- 데이터베이스 함수 정의 ---
+# init_db()를 이미 마친 저장소 (Streamlit은 재실행마다 스크립트 맨 위의 init_db()를 다시 부른다)
+_initialized = set()
+_init_lock = threading.Lock()
+
+def init_db():
+    #앱 실행 시 필요한 데이터베이스와 테이블(사용자, 소비 기록, 위시리스트)을 자동으로 생성한다.
+    #'money_manager.db' 파일이 생성되고, 사용자가 입력한 데이터를 영구적으로 저장할 공간이 생긴다.
+    # 테이블 생성과 컬럼 추가는 migrations.py에서 버전별로 딱 한 번씩만 적용된다.
+    # 기본 DB(디렉터리)를 먼저 준비한 뒤, 디렉터리에 적힌 반별 DB(샤드)도 모두 준비한다.
+    # STORAGE_URL로 다른 저장소를 골랐으면 그 저장소를 열고 준비한다.
+    # 서버 프로세스마다 저장소별로 한 번만 실제로 준비하고, 그다음부터는 바로 돌아간다.
+    global _storage
+    with _init_lock:
+        if _storage is None and STORAGE_URL and not STORAGE_URL.startswith('sqlite:'):
+            _storage = open_storage(STORAGE_URL)
+        key = _storage if _storage is not None else DB_PATH
+        if key in _initialized:
+            return
+        if _storage is not None:
+            _storage.migrate()
+        else:
+            _storage_for(DB_PATH).migrate()
+            for path in _router.shards():
+                prepare_shard(path)
+        _initialized.add(key)
+
+def _change_class(username, class_name):
+    # 반을 바꾼 학생을 디렉터리에 적고, 새 반이 다른 샤드에 있으면 기록을 그 샤드로 옮긴다.
+    if _storage is not None:
+        _storage.set_user_class(username, class_name)
+        return
+    old_path = _router.shard_of_user(username)
+    new_path, new_relative = _router.class_assignment(class_name)
+    flip = lambda c: set_user_class(c, username, class_name, new_relative)
+    if new_path != old_path:
+        prepare_shard(new_path)
+        move_users([username], old_path, new_path, DB_PATH, get_connection, flip)
+    else:
+        with get_connection() as conn:
+            flip(conn.cursor())
+            conn.commit()
+    _storage_for(new_path).set_user_class(username, class_name)
+    _router.reload()
+
+def _create_user(username, pin, class_name):
+    # 디렉터리에 반을 적고(새 반이면 샤드 배정) 그 반의 샤드에 가입시킨다.
+    if _storage is not None:
+        _storage.create_user(username, pin, class_name)
+        return
+    new_path, new_relative = _router.class_assignment(class_name)
+    prepare_shard(new_path)
+    with get_connection() as conn:
+        set_user_class(conn.cursor(), username, class_name, new_relative)
+        conn.commit()
+    _storage_for(new_path).create_user(username, pin, class_name)
+
+@profiling.timed('db.login_user', rows=lambda result: 0)
+def login_user(username, pin, class_name=''):
+    #로그인 및 자동 회원가입 로직을 처리한다.
+    #DB에 없는 닉네임이면 자동으로 가입시켜 초등학생들이 복잡한 절차 없이 바로 앱을 사용할 수 있게 한다.
+    # 반(class_name)을 적었다면 가입할 때 저장하고, 기존 학생은 반이 바뀌었을 때만 고친다.
+    class_name = (class_name or '').strip()
+    result = _user_storage(username).get_user(username)
+    if result:
+        if result[0] != pin:
+            return False, "비밀번호가 틀렸어요. 다시 확인해볼까요?"
+        if not class_name or class_name == result[1]:
+            return True, "로그인 성공! 어서와요!"
+        _change_class(username, class_name)
+        message = "로그인 성공! 어서와요!"
+    else:
+        # 신규 유저 자동 가입
+        _create_user(username, pin, class_name)
+        message = "새로운 친구 환영해요! 가입이 완료되었어요!"
+    _user_leaderboard(username).upsert(username, class_name=class_name)
+    bump_data_version(username, LEADERBOARD_SCOPE)
+    return True, message
+
+def _frame(rows, columns):
+    # 조회 결과를 DataFrame으로 만든다. pandas는 불러오는 데 수백 ms가 걸려서,
+    # 로그인 화면처럼 표가 필요 없는 화면에서는 불러오지 않도록 처음 쓸 때 import한다.
+    import pandas as pd
+    return pd.DataFrame(rows, columns=list(columns))
+
+# (저장소, 닉네임) -> 마지막으로 read()와 맞는다고 확인한 보관 목록 (_read_with_archive)
+_known_parts = {}
+
+def _read_with_archive(storage, username, read):
+    # (보관 목록, read() 결과). 보관 작업(archive.py)은 기록을 지우고 목록을 늘리는 일을 한 트랜잭션으로 하므로,
+    # 읽기 전후의 목록이 같으면 read()가 본 기록과 목록이 서로 맞다. 그 사이 보관이 끝났으면 다시 읽는다.
+    # 보관 목록은 늘어나기만 하므로, 읽은 뒤의 목록이 전에 확인한 목록과 같으면 읽는 동안에도 그대로였다.
+    # 그래서 보통은 목록을 한 번만 조회하고, 처음 읽을 때와 목록이 바뀌었을 때만 앞뒤로 조회한다.
+    key = (storage, username)
+    known = _known_parts.get(key)
+    if known is not None:
+        result = read()
+        parts = storage.archived_parts(username)
+        if parts == known:
+            return parts, result
+    while True:
+        parts = storage.archived_parts(username)
+        result = read()
+        if storage.archived_parts(username) == parts:
+            _known_parts[key] = parts
+            return parts, result
+
+def _after_activity(username, stats):
+    # 캐시된 통계와 랭킹을 무효화하고, 방금 알게 된 새 통계는 바로 캐시에 넣어 사이드바가 다시 조회하지 않게 한다.
+    _, xp, points = stats
+    _user_leaderboard(username).upsert(username, xp=xp, points=points)
+    bump_data_version(username, LEADERBOARD_SCOPE)
+    get_user_stats.prime(stats, username)
+
+@profiling.timed('db.update_user_activity', rows=lambda result: 0)
+@_retry_on_move
+def update_user_activity(username, xp_gain=10, points_gain=10):
+    #사용자가 소비를 기록할 때마다 보상(XP, 포인트)을 지급하고 연속 접속일(Streak)을 계산한다.
+    #'정의적 비계'로서 학생들에게 지속적인 학습 동기를 부여한다.
+    """활동 기록 시 스트릭, 경험치, 포인트 업데이트 후 새 (스트릭, XP, 포인트) 반환"""
+    stats = _user_storage(username).update_activity(username, xp_gain, points_gain, datetime.now().date())
+    _after_activity(username, stats)
+    return stats
+
+@cached_reader(lambda username, *args, **kwargs: [username])
+@profiling.timed('db.get_user_stats')
+def get_user_stats(username):
+    #사용자의 현재 레벨과 랭킹 정보를 표시하기 위해 DB에서 데이터를 조회한다.
+    return _user_storage(username).get_user_stats(username)
+
+@cached_reader(_leaderboard_scopes)
+@profiling.timed('db.get_leaderboard')
+def get_leaderboard(class_name=SCHOOL, limit=5):
+    #사회적 모델링를 통해 포인트가 높은 상위 5명의 친구 목록을 가져온다.
+    # class_name을 주면 그 반 안에서의 순위를 보여준다. 랭킹은 메모리에 정렬된 채로 유지되므로 다시 정렬하지 않는다.
+    # 반을 주지 않으면 모든 샤드(학교)의 상위 목록을 포인트 순으로 합쳐 전체 순위를 만든다.
+    if class_name is not SCHOOL:
+        rows = _leaderboard_for(_class_storage(class_name)).top(class_name, limit)
+    else:
+        tops = [_leaderboard_for(storage).top(SCHOOL, limit) for storage in _all_storages()]
+        rows = list(islice(heapq.merge(*tops, key=lambda row: (-row[2], row[0])), limit))
+    return _frame(rows, ['username', 'xp', 'points'])
+
+@profiling.timed('db.get_my_rank', rows=lambda result: 0)
+def get_my_rank(username, class_name=SCHOOL):
+    # 상위 5명 밖에 있어도 내 순위를 보여줄 수 있도록 (순위, 전체 인원)을 돌려준다.
+    # 전체 순위는 샤드마다 나보다 포인트가 높은 인원을 세어 더한다.
+    if class_name is not SCHOOL:
+        return _leaderboard_for(_class_storage(class_name)).rank_of(username, class_name)
+    points = _user_leaderboard(username).points_of(username)
+    counts = [_leaderboard_for(storage).count_ahead(points or 0) for storage in _all_storages()]
+    size = sum(group_size for _, group_size in counts)
+    if points is None:
+        return None, size
+    return sum(ahead for ahead, _ in counts) + 1, size
+
+def get_usernames():
+    # 가입한 모든 닉네임 (일괄 불러오기에서 없는 닉네임을 걸러낼 때 쓴다)
+    names = set()
+    for storage in _all_storages():
+        names.update(storage.usernames())
+    return names
+
+def get_user_class(username):
+    return _user_leaderboard(username).class_of(username)
+
+@profiling.timed('db.add_expense_db', rows=lambda result: 0)
+@_retry_on_move
+def add_expense_db(username, date, item, price, category, type_val):
+    #소비 내역(날짜, 항목, 금액, Need/Want 여부)을 DB에 저장하고 보상을 지급한다.
+    # 기록 저장, 월간 요약 갱신, 보상 지급을 한 트랜잭션으로 처리하고 새 (스트릭, XP, 포인트)를 돌려준다.
+    # 학생이 이 샤드에 없으면 UserNotFound가 나서 트랜잭션 전체가 취소되고, 새 샤드에서 다시 쓴다.
+    row = (username, str(date), item, price, category, type_val)
+    stats = _user_storage(username).add_expenses([row], 10, 10, datetime.now().date())[username]
+    _after_activity(username, stats)
+    return stats
+
+def _group_by_storage(rows, indexes):
+    # rows 중 indexes 위치의 줄을 저장소별로 나눈다. {저장소: [위치, ...]}
+    storage_of = {username: _user_storage(username) for username in {rows[i][0] for i in indexes}}
+    groups = {}
+    for i in indexes:
+        groups.setdefault(storage_of[rows[i][0]], []).append(i)
+    return groups
+
+
+class PartialWriteError(RuntimeError):
+    # add_expenses_bulk에서 일부 샤드만 저장되었을 때 난다. 원래 오류는 __cause__에 있다.
+    # stats: 저장된 사용자별 새 (스트릭, XP, 포인트), failed: 저장되지 않은 줄의 위치(rows 안의 순서)
+    # 저장된 줄을 다시 보내면 기록과 보상이 두 번 들어가므로, 다시 시도할 때는 failed의 줄만 보낸다.
+    def __init__(self, stats, failed):
+        super().__init__(f'{len(failed)}줄을 저장하지 못했어요.')
+        self.stats = stats
+        self.failed = failed
+
+
+@profiling.timed('db.add_expenses_bulk', rows=lambda result: 0)
+def add_expenses_bulk(rows, xp_per_row=10, points_per_row=10, per_row=True):
+    # 검사를 마친 소비 기록 묶음 [(username, date, item, price, category, type), ...]을 샤드별로 한 트랜잭션씩 저장한다.
+    # 기록은 한 번에 넣고, 월간 요약과 보상(XP, 포인트, 스트릭)은 사용자별로 모아서 한 번씩만 갱신한다.
+    # per_row=False면 보상은 줄 수와 상관없이 이 묶음에서 사용자마다 한 번이다. (일괄 불러오기)
+    # 저장한 사용자별 새 (스트릭, XP, 포인트)를 돌려준다.
+    # 샤드마다 따로 커밋하므로 한 샤드가 실패해도 나머지 샤드는 저장하고, 끝에 PartialWriteError로 알린다.
+    rows = [(username, str(date), item, price, category, type_val)
+            for username, date, item, price, category, type_val in rows]
+    if not rows:
+        return {}
+    today = datetime.now().date()
+    stats = {}
+    failed = []
+    error = None
+    for storage, indexes in _group_by_storage(rows, range(len(rows))).items():
+        try:
+            try:
+                stats.update(storage.add_expenses([rows[i] for i in indexes], xp_per_row, points_per_row, today, per_row))
+            except UserNotFound:
+                # 그 사이 다른 샤드로 옮겨진 학생이 있다. 디렉터리를 다시 읽고 이 묶음만 다시 나눠 저장한다.
+                # (UserNotFound는 트랜잭션 전체를 취소하므로 이 묶음은 아직 아무것도 저장되지 않았다)
+                _router.reload()
+                for new_storage, moved in _group_by_storage(rows, indexes).items():
+                    try:
+                        stats.update(new_storage.add_expenses([rows[i] for i in moved], xp_per_row,
+                                                              points_per_row, today, per_row))
+                    except Exception as e:
+                        failed.extend(moved)
+                        error = error or e
+        except Exception as e:
+            failed.extend(indexes)
+            error = error or e
+    # 저장된 샤드의 사용자는 실패한 샤드가 있어도 캐시와 랭킹을 갱신한다.
+    for username, user_stats in stats.items():
+        _after_activity(username, user_stats)
+    if failed:
+        raise PartialWriteError(stats, sorted(failed)) from error
+    return stats
+
+@cached_reader(lambda username, *args, **kwargs: [username])
+@profiling.timed('db.get_expenses_db')
+def get_expenses_db(username):
+    # 사용자의 모든 소비 기록을 최신순으로 가져온다. 보관된 달(archive.py)의 기록도 함께 읽는다.
+    storage = _user_storage(username)
+    parts, rows = _read_with_archive(storage, username, lambda: storage.all_expenses(username))
+    if parts:
+        import archive
+        table = archive.read_archived(username, tuple(path for _, path in parts), EXPENSE_FIELDS)
+        rows = sorted([*rows, *archive.rows_of(table)], key=lambda row: row[2], reverse=True)
+    return _frame(rows, EXPENSE_FIELDS)
+
+@profiling.timed('db.add_wishlist_db', rows=lambda result: 0)
+def add_wishlist_db(username, item_name, target_price, image_data):
+    # '내 꿈 저금통(Tab 4)'에 목표 물건을 저장한다. (단순화를 위해 기존 목표 덮어쓰기를 한다.)
+    # 사진은 사진 저장소에 저장하고 DB에는 해시만 기록한다.
+    image_hash = image_store.save_image(image_data)
+    _user_storage(username).set_wishlist(username, item_name, target_price, image_hash)
+    bump_data_version(username)
+
+# 소비 내역 표에서 고를 수 있는 컬럼
+EXPENSE_COLUMNS = ('id', 'date', 'item', 'price', 'category', 'type')
+
+@cached_reader(lambda username, *args, **kwargs: [username])
+@profiling.timed('db.get_expense_page', rows=lambda result: len(result[0]))
+def get_expense_page(username, columns=('date', 'item', 'price', 'category', 'type'), after=None, limit=20):
+    # 소비 내역을 최신순((date, id) 내림차순)으로 한 페이지씩 가져온다.
+    # after에는 이전 페이지의 next_cursor를 넘긴다. OFFSET 대신 (date, id) 위치부터 이어 읽으므로
+    # 기록이 수만 건이어도 인덱스에서 limit줄만 읽는다.
+    # (DataFrame, next_cursor)를 돌려주며, 마지막 페이지면 next_cursor는 None이다.
+    columns = tuple(columns)
+    unknown = set(columns) - set(EXPENSE_COLUMNS)
+    if unknown:
+        raise ValueError(f"알 수 없는 컬럼: {sorted(unknown)}")
+    # 저장소와 보관 파일에서는 고른 열만 읽는다. 다음 위치(cursor)를 만들 date, id는 없으면 뒤에 붙여 읽는다.
+    fields = columns + tuple(name for name in ('date', 'id') if name not in columns)
+    # 다음 페이지가 있는지 알기 위해 한 줄 더 읽는다.
+    # 보관된 달(archive.py)까지 넘겨 보면 그 달의 Parquet 파일에서 이 학생의 그 위치 이전 줄만 읽어 이어 붙인다.
+    storage = _user_storage(username)
+    parts, rows = _read_with_archive(storage, username,
+                                     lambda: storage.expense_page(username, after, limit + 1, fields))
+    if parts:
+        import archive
+        rows = archive.merge_page(rows, parts, username, after, limit + 1, fields)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = (last[fields.index('date')], int(last[fields.index('id')]))
+    if len(fields) > len(columns):
+        rows = [row[:len(columns)] for row in rows]
+    return _frame(rows, columns), next_cursor
+
+@cached_reader(lambda username, *args, **kwargs: [username])
+@profiling.timed('db.get_wishlist_db')
+def get_wishlist_db(username):
+    # 목표 정보만 읽는다. 사진은 화면에 그릴 때 해시로 썸네일 파일을 찾는다.
+    return _user_storage(username).get_wishlist(username)
+
+@cached_reader(lambda username: [username])
+@profiling.timed('db.get_expense_columns')
+def get_expense_columns(username):
+    # 사용자의 소비 기록을 분석용 열 묶음(expense_columns.ExpenseColumns)으로 가져온다.
+    # 데이터 버전마다 한 번만 만들고, 달력/지난달 비교/무지출 연속 기록/AI 코치가 모두 이 묶음에서 계산한다.
+    # numpy도 pandas처럼 불러오는 데 오래 걸리므로 처음 쓸 때 import한다.
+    # 보관된 달(archive.py)은 필요한 네 열만 읽어 두고(파일 목록별 캐시) 새 기록이 들어올 때마다 다시 읽지 않는다.
+    from expense_columns import ExpenseColumns
+    storage = _user_storage(username)
+    parts, (rows, categories, types) = _read_with_archive(storage, username, lambda: storage.expense_columns(username))
+    archived = None
+    if parts:
+        import archive
+        archived = archive.read_archived(username, tuple(path for _, path in parts), ('date', 'price', 'category', 'type'))
+    return ExpenseColumns.from_rows(rows, categories, types, archived)
+
+@cached_reader(lambda username, *args, **kwargs: [username])
+@profiling.timed('db.get_spending_summary')
+def get_spending_summary(username, month=None):
+    # 월간 요약 테이블에서 종류(category)와 유형(Need/Want)별 합계를 가져온다.
+    # month('YYYY-MM')를 주면 그 달만, 없으면 전체 기간을 합산한다.
+    rows = _user_storage(username).spending_summary(username, month)
+    return _frame(rows, ['category', 'type', 'total', 'count'])
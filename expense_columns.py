@@ -0,0 +1,131 @@
+import numpy as np
+
+from storage.base import from_epoch_day, to_epoch_day
+
+# 분석용 열(column) 묶음.
+# 한 학생의 소비 기록을 날짜 오름차순의 numpy 배열 몇 개로 담는다.
+# - days: int32 epoch-day (정렬되어 있다)
+# - amounts: int64 금액
+# - categories, types: uint8 코드 (category_labels/type_labels로 이름을 찾는다. 코드 0은 이름 없음)
+# 기간 합계는 정렬된 날짜에서 searchsorted로 위치를 찾아 누적 합 두 개를 빼고,
+# 종류/유형/달별 합계는 np.bincount 한 번으로 구한다. 달력, 지난달 비교, 무지출 연속 기록, AI 코치가 함께 쓴다.
+# database.get_expense_columns()가 사용자 데이터 버전마다 한 번만 만들어 캐시하며, 여러 세션이 함께 쓰므로 읽기만 한다.
+
+
+def month_number(month):
+    # 'YYYY-MM' -> 1970-01부터 센 달 수
+    return int(np.datetime64(month, 'M').astype(np.int64))
+
+
+def _label_codes(column, labels):
+    # pyarrow 문자열 열 -> labels의 코드 배열. labels에 없는 이름은 끝에 추가하고, 빈 값은 코드 0(이름 없음)이다.
+    encoded = column.combine_chunks().dictionary_encode()
+    index = {label: code for code, label in enumerate(labels)}
+    lookup = []
+    for label in encoded.dictionary.to_pylist():
+        if label not in index:
+            index[label] = len(labels)
+            labels.append(label)
+        lookup.append(index[label])
+    lookup.append(0)  # 빈 값
+    indices = encoded.indices.fill_null(len(lookup) - 1).to_numpy()
+    return np.array(lookup, dtype=np.int64)[indices]
+
+
+class ExpenseColumns:
+
+    def __init__(self, days, amounts, categories, types, category_labels, type_labels):
+        self.days = days
+        self.amounts = amounts
+        self.categories = categories
+        self.types = types
+        self.category_labels = tuple(category_labels)
+        self.type_labels = tuple(type_labels)
+        # 달 번호(1970-01부터 센 달 수). 달별 합계를 묶을 때 쓴다.
+        self.months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)
+        # cumsum[i] = 앞에서부터 i줄의 합. 기간 합계 = cumsum[끝] - cumsum[시작]
+        self.cumsum = np.concatenate(([0], np.cumsum(amounts)))
+
+    @classmethod
+    def from_rows(cls, rows, category_labels, type_labels, archived=None):
+        # rows: [(epoch-day, 금액, 종류 코드, 유형 코드), ...] 날짜 오름차순 (Storage.expense_columns)
+        # archived: 보관된 달의 기록 (archive.read_archived의 date, price, category, type 열 pyarrow Table)
+        days, amounts, categories, types = np.array(rows, dtype=np.int64).reshape(-1, 4).T
+        if archived is not None and archived.num_rows:
+            category_labels, type_labels = list(category_labels), list(type_labels)
+            # 보관된 줄을 앞에 붙이고 날짜로 다시 정렬한다. (보관 뒤에 예전 날짜로 들어온 기록이 있을 수 있다)
+            days = np.concatenate([archived.column('date').cast('int32').to_numpy(), days])
+            amounts = np.concatenate([archived.column('price').fill_null(0).to_numpy(), amounts])
+            categories = np.concatenate([_label_codes(archived.column('category'), category_labels), categories])
+            types = np.concatenate([_label_codes(archived.column('type'), type_labels), types])
+            order = np.argsort(days, kind='stable')
+            days, amounts, categories, types = days[order], amounts[order], categories[order], types[order]
+        # 코드는 조회 표 크기에 맞춰 고른다. (선택지가 256개를 넘을 일은 없지만 잘리지 않게 한다)
+        code_dtype = np.uint8 if max(len(category_labels), len(type_labels)) <= 256 else np.uint16
+        return cls(days.astype(np.int32), amounts.astype(np.int64), categories.astype(code_dtype),
+                   types.astype(code_dtype), category_labels, type_labels)
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def nbytes(self):
+        # 캐시 메모리 상한(cache.py)을 지키기 위한 크기
+        return sum(a.nbytes for a in (self.days, self.amounts, self.categories, self.types, self.months, self.cumsum))
+
+    @property
+    def total(self):
+        return int(self.cumsum[-1])
+
+    def _span(self, start=None, end=None):
+        # 기간(양 끝 포함, date 또는 'YYYY-MM-DD')에 해당하는 줄 범위 [lo, hi). 비워 두면 처음/끝까지
+        lo = 0 if start is None else int(np.searchsorted(self.days, to_epoch_day(start), 'left'))
+        hi = len(self.days) if end is None else int(np.searchsorted(self.days, to_epoch_day(end), 'right'))
+        return lo, max(lo, hi)
+
+    def range_total(self, start, end):
+        lo, hi = self._span(start, end)
+        return int(self.cumsum[hi] - self.cumsum[lo])
+
+    def daily_totals(self, start, end):
+        # 기간의 {date: 합계}. 합계가 0인 날은 넣지 않는다. (달력이 날짜마다 찾아본다)
+        lo, hi = self._span(start, end)
+        days, starts = np.unique(self.days[lo:hi], return_index=True)
+        if not len(days):
+            return {}
+        sums = np.add.reduceat(self.amounts[lo:hi], starts)
+        return {from_epoch_day(int(day)): int(total) for day, total in zip(days, sums) if total}
+
+    def no_spend_streak(self, today, longest=31):
+        # today부터 거꾸로 센 지출 없는 날 수 (today에 썼으면 0). longest일에서 멈춘다.
+        hi = self._span(None, today)[1]
+        spent = np.flatnonzero(self.amounts[:hi])
+        if not len(spent):
+            return longest
+        return min(to_epoch_day(today) - int(self.days[spent[-1]]), longest)
+
+    def _grouped(self, codes, code_labels, labels, lo, hi):
+        sums = np.bincount(codes[lo:hi], weights=self.amounts[lo:hi], minlength=len(code_labels))
+        index = {label: code for code, label in enumerate(code_labels)}
+        return np.array([sums[index[label]] if label in index else 0 for label in labels], dtype=np.int64)
+
+    def totals_by_category(self, labels, start=None, end=None):
+        # labels 순서대로 종류별 합계 (int64 배열). 기간을 주면 그 기간만
+        return self._grouped(self.categories, self.category_labels, labels, *self._span(start, end))
+
+    def totals_by_type(self, labels, start=None, end=None):
+        return self._grouped(self.types, self.type_labels, labels, *self._span(start, end))
+
+    def monthly_totals_by_category(self, labels):
+        # (달 번호 배열, 달 x labels 합계 행렬). 기록이 있는 달만 오름차순으로 담는다.
+        # labels에 없는 종류의 기록도 그 달을 '기록이 있는 달'로 만들지만 합계 행렬에는 들어가지 않는다.
+        months, row = np.unique(self.months, return_inverse=True)
+        index = {label: code for code, label in enumerate(self.category_labels)}
+        column_of_code = np.full(len(self.category_labels), len(labels))  # labels에 없는 코드는 마지막 버림 칸으로
+        for column, label in enumerate(labels):
+            if label in index:
+                column_of_code[index[label]] = column
+        width = len(labels) + 1
+        sums = np.bincount(row * width + column_of_code[self.categories], weights=self.amounts,
+                           minlength=len(months) * width)
+        return months, sums.reshape(len(months), width)[:, :-1].astype(np.int64)
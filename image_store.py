@@ -0,0 +1,78 @@
+import hashlib
+import io
+import os
+import tempfile
+
+# 위시리스트 사진 저장소.
+# 사진은 DB의 BLOB 대신 디스크에 내용 해시(SHA-256) 이름으로 저장하고, DB에는 해시만 남긴다.
+# 같은 사진을 여러 학생이 올려도 한 번만 저장되며, 화면에는 올릴 때 만들어 둔 작은 썸네일을 보여준다.
+
+IMAGE_DIR = 'wishlist_images'
+THUMBNAIL_SIZE = (400, 400)
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow가 없으면 썸네일 대신 원본을 그대로 쓴다.
+    Image = None
+
+
+def _path(image_hash, suffix):
+    return os.path.join(IMAGE_DIR, image_hash[:2], image_hash + suffix)
+
+
+def original_path(image_hash):
+    return _path(image_hash, '.img')
+
+
+def thumbnail_path(image_hash):
+    # 썸네일을 만들지 못한 사진은 원본 경로를 돌려준다.
+    path = _path(image_hash, '.thumb.jpg')
+    return path if os.path.exists(path) else original_path(image_hash)
+
+
+def _write_atomic(path, data):
+    # 다 쓴 파일만 보이도록 임시 파일에 쓴 뒤 이름을 바꾼다.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _make_thumbnail(data):
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.thumbnail(THUMBNAIL_SIZE)
+            if img.mode in ('RGBA', 'LA', 'P'):
+                # 투명 배경은 흰색으로 채운다. (JPEG는 투명도를 지원하지 않음)
+                img = img.convert('RGBA')
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+            out = io.BytesIO()
+            img.save(out, format='JPEG', quality=85, optimize=True)
+            return out.getvalue()
+    except (OSError, ValueError):
+        # 사진으로 읽을 수 없는 파일이면 썸네일 없이 원본만 저장한다.
+        return None
+
+
+def save_image(data):
+    # 사진을 저장하고 해시를 돌려준다. 이미 같은 사진이 있으면 다시 쓰지 않는다.
+    if not data:
+        return None
+    image_hash = hashlib.sha256(data).hexdigest()
+    if not os.path.exists(original_path(image_hash)):
+        thumbnail = _make_thumbnail(data)
+        if thumbnail is not None:
+            _write_atomic(_path(image_hash, '.thumb.jpg'), thumbnail)
+        _write_atomic(original_path(image_hash), data)
+    return image_hash
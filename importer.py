@@ -0,0 +1,260 @@
+import argparse
+import codecs
+import csv
+import io
+import math
+import sys
+import time
+from datetime import datetime
+
+import database
+from database import EXPENSE_CATEGORIES, EXPENSE_TYPES
+
+# 종이 용돈기입장을 옮겨 적은 CSV/엑셀 파일을 한꺼번에 불러온다.
+# 파일을 한 줄씩 읽으면서 검사하고, CHUNK_SIZE줄씩 모아 한 트랜잭션으로 저장한다. (database.add_expenses_bulk)
+# 사용법: python importer.py 기입장.csv --user 짱구
+#         python importer.py 우리반.xlsx            (파일에 '닉네임' 열이 있을 때)
+
+CHUNK_SIZE = 500
+
+# 보상(XP, 포인트, 스트릭)은 줄마다가 아니라 묶음(CHUNK_SIZE줄, 한 트랜잭션)마다 학생별로 한 번 준다.
+# 파일은 얼마든지 지어낼 수 있어서, 줄 수만큼 보상을 주면 가짜 기입장 하나로 랭킹 1등이 될 수 있다.
+IMPORT_XP_PER_BATCH = 10
+IMPORT_POINTS_PER_BATCH = 10
+
+# 한 줄의 금액 상한(원). 이보다 크면(1e30 같은 값) 잘못 적은 것으로 보고 건너뛴다.
+MAX_PRICE = 10_000_000
+
+# 파일의 열 이름 -> 내부 이름 (한글/영어 모두 허용)
+COLUMN_ALIASES = {
+    '닉네임': 'username', '이름': 'username', 'username': 'username', 'user': 'username',
+    '날짜': 'date', 'date': 'date',
+    '내용': 'item', 'item': 'item',
+    '금액': 'price', 'price': 'price', 'amount': 'price',
+    '종류': 'category', 'category': 'category',
+    '유형': 'type', 'type': 'type',
+}
+
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%Y%m%d")
+
+
+class ImportFileError(RuntimeError):
+    # 파일 자체를 읽을 수 없을 때 (인코딩, 깨진 CSV/엑셀). 화면과 명령줄에 메시지를 그대로 보여준다.
+    pass
+
+
+def _choice_words(label):
+    # "필요해요 (Need) ✅" -> {"필요해요 (need) ✅", "필요해요", "need", "✅"}
+    words = {label.lower()}
+    for word in label.replace('(', ' ').replace(')', ' ').split():
+        words.add(word.lower())
+    return words
+
+
+_CATEGORY_LOOKUP = {word: label for label in EXPENSE_CATEGORIES for word in _choice_words(label)}
+_TYPE_LOOKUP = {word: label for label in EXPENSE_TYPES for word in _choice_words(label)}
+
+
+def _match_choice(value, lookup, what):
+    # 입력 폼의 선택지와 똑같거나, 이모지를 뺀 이름("간식", "Need")만 적어도 인정한다.
+    label = lookup.get(str(value or '').strip().lower())
+    if label is None:
+        raise ValueError(f"알 수 없는 {what}: {value!r}")
+    return label
+
+
+def _parse_date(value):
+    if hasattr(value, 'date'):  # 엑셀 셀은 datetime으로 읽힌다.
+        return value.date()
+    text = str(value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"날짜 형식이 잘못됨: {value!r}")
+
+
+def _parse_price(value):
+    text = str(value if value is not None else '').replace(',', '').replace('원', '').strip()
+    try:
+        amount = float(text)
+    except ValueError:
+        raise ValueError(f"금액이 숫자가 아님: {value!r}")
+    if not math.isfinite(amount):
+        raise ValueError(f"금액이 숫자가 아님: {value!r}")
+    if amount > MAX_PRICE:
+        raise ValueError(f"금액이 너무 큼: {value!r}")
+    price = int(amount)
+    if price <= 0:
+        raise ValueError(f"금액은 0보다 커야 함: {value!r}")
+    return price
+
+
+def validate_row(record, default_username=None):
+    # 파일 한 줄(열 이름 -> 값)을 검사해 add_expenses_bulk에 넣을 튜플로 바꾼다. 잘못되면 ValueError.
+    username = str(record.get('username') or default_username or '').strip()
+    if not username:
+        raise ValueError("닉네임이 없음")
+    item = str(record.get('item') or '').strip()
+    if not item:
+        raise ValueError("내용이 없음")
+    return (
+        username,
+        _parse_date(record.get('date')),
+        item,
+        _parse_price(record.get('price')),
+        _match_choice(record.get('category'), _CATEGORY_LOOKUP, '종류'),
+        _match_choice(record.get('type'), _TYPE_LOOKUP, '유형'),
+    )
+
+
+def _header(row):
+    return [COLUMN_ALIASES.get(str(name or '').strip().lower(), str(name or '').strip()) for name in row]
+
+
+def _csv_encoding(stream):
+    # UTF-8(엑셀이 저장한 BOM 포함)로 끝까지 읽히면 utf-8-sig, 아니면 cp949. (한국어 엑셀의 'CSV' 저장 형식)
+    # 중간에 인코딩을 바꾸면 이미 저장한 줄이 생기므로, 읽기 전에 한 번 훑어서 정한다.
+    start = stream.tell()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for block in iter(lambda: stream.read(1 << 16), b''):
+            decoder.decode(block)
+        decoder.decode(b'', final=True)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp949'
+    finally:
+        stream.seek(start)
+
+
+def _iter_csv(stream):
+    # 바이트 스트림이면 인코딩을 골라(_csv_encoding) 글자로 읽는다.
+    wrapper = None
+    if not isinstance(stream, io.TextIOBase):
+        stream = wrapper = io.TextIOWrapper(stream, encoding=_csv_encoding(stream), newline='')
+    reader = csv.reader(stream)
+    try:
+        header = _header(next(reader, []))
+        for row in reader:
+            if any(cell.strip() for cell in row):
+                yield reader.line_num, dict(zip(header, row))
+    except UnicodeDecodeError:
+        raise ImportFileError("파일의 글자를 읽을 수 없어요. CSV(UTF-8) 또는 엑셀 파일로 저장해서 다시 올려 주세요.")
+    except csv.Error as e:
+        raise ImportFileError(f"{reader.line_num}번째 줄을 CSV로 읽을 수 없어요. ({e})")
+    finally:
+        if wrapper is not None:
+            wrapper.detach()  # 원래 스트림(업로드 파일)은 닫지 않는다.
+
+
+def _iter_excel(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("엑셀 파일을 읽으려면 openpyxl이 필요해요. (pip install openpyxl)")
+    # read_only 모드는 시트를 통째로 메모리에 올리지 않고 한 줄씩 읽는다.
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFileError(f"엑셀 파일을 열 수 없어요. 파일이 손상되지 않았는지 확인해 주세요. ({type(e).__name__})")
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _header(next(rows, []))
+        for line_num, row in enumerate(rows, start=2):
+            if any(cell not in (None, '') for cell in row):
+                yield line_num, dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def iter_records(stream, filename):
+    # 파일 확장자에 따라 CSV 또는 엑셀에서 (줄 번호, {열 이름: 값})을 하나씩 꺼낸다.
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        return _iter_excel(stream)
+    return _iter_csv(stream)
+
+
+def import_expenses(stream, filename, default_username=None, chunk_size=CHUNK_SIZE, known_users=None):
+    # 파일을 불러와 결과 보고서를 돌려준다.
+    # {'inserted': 저장한 줄 수, 'rejected': [(줄 번호, 이유), ...], 'seconds': 걸린 시간, 'rows_per_second': 초당 줄 수}
+    # known_users가 주어지면 그 안에 있는 닉네임만 받는다. (없으면 DB의 가입자 목록을 쓴다)
+    if known_users is None:
+        known_users = database.get_usernames()
+    started = time.perf_counter()
+    inserted = 0
+    rejected = []
+    chunk = []
+    chunk_lines = []
+
+    def save():
+        # 샤드 하나가 실패해도 다른 샤드의 줄은 이미 저장되었으므로, 저장되지 않은 줄만 건너뛴 줄로 알린다.
+        try:
+            database.add_expenses_bulk(chunk, IMPORT_XP_PER_BATCH, IMPORT_POINTS_PER_BATCH, per_row=False)
+        except database.PartialWriteError as e:
+            for i in e.failed:
+                rejected.append((chunk_lines[i], f"저장하지 못함: {e.__cause__ or e}"))
+            return len(chunk) - len(e.failed)
+        return len(chunk)
+
+    try:
+        for line_num, record in iter_records(stream, filename):
+            try:
+                row = validate_row(record, default_username)
+            except ValueError as e:
+                rejected.append((line_num, str(e)))
+                continue
+            if row[0] not in known_users:
+                rejected.append((line_num, f"가입하지 않은 닉네임: {row[0]!r}"))
+                continue
+            chunk.append(row)
+            chunk_lines.append(line_num)
+            if len(chunk) >= chunk_size:
+                inserted += save()
+                chunk, chunk_lines = [], []
+    except ImportFileError as e:
+        # 파일 중간에서 읽기가 멈추면 그 앞까지 검사를 마친 줄은 저장하고, 몇 줄을 저장했는지 함께 알린다.
+        if chunk:
+            inserted += save()
+        if inserted:
+            raise ImportFileError(f"{e} 그 앞의 {inserted:,}줄은 저장했어요.") from e
+        raise
+    if chunk:
+        inserted += save()
+    rejected.sort()
+    seconds = time.perf_counter() - started
+    return {
+        'inserted': inserted,
+        'rejected': rejected,
+        'seconds': seconds,
+        'rows_per_second': inserted / seconds if seconds > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='용돈기입장 CSV/엑셀 일괄 불러오기')
+    parser.add_argument('file', help='CSV 또는 .xlsx 파일')
+    parser.add_argument('--user', help="파일에 '닉네임' 열이 없을 때 기록을 넣을 닉네임")
+    parser.add_argument('--db', default=database.DB_PATH, help='DB 파일 경로 (기본: money_manager.db)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='한 트랜잭션에 넣을 줄 수')
+    args = parser.parse_args(argv)
+
+    database.DB_PATH = args.db
+    database.init_db()
+    try:
+        with open(args.file, 'rb') as f:
+            report = import_expenses(f, args.file, args.user, args.chunk_size)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    for line_num, reason in report['rejected']:
+        print(f'{line_num}번째 줄 건너뜀: {reason}')
+    print(f"{report['inserted']}줄 저장, {len(report['rejected'])}줄 건너뜀 "
+          f"({report['seconds']:.2f}초, 초당 {report['rows_per_second']:,.0f}줄)")
+    return 1 if report['rejected'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
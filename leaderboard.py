@@ -0,0 +1,143 @@
+import bisect
+import threading
+import time
+
+# 반(그룹)별 랭킹을 메모리에 정렬된 상태로 유지한다.
+# 포인트가 바뀔 때 그 학생 한 명의 위치만 옮기므로, 랭킹을 볼 때마다 전체 사용자를 다시 정렬하지 않는다.
+# '내 순위'는 정렬된 목록에서 이진 탐색(bisect)으로 O(log n)에 찾는다.
+# 위치를 옮기는 것(insort, del)은 위치를 찾는 데는 O(log n)이지만 목록 원소를 밀고 당기므로 O(n)이다.
+# (한 학교 인원 정도는 memmove 한 번이라 충분히 빠르다. 훨씬 커지면 트리 구조로 바꾼다.)
+
+SCHOOL = None  # 반 구분 없이 학교 전체 순위를 나타내는 그룹 키
+
+# 다른 프로세스(명령줄 도구 등)가 DB를 바꾼 경우를 위해, 이 시간이 지나면 DB에서 한 번 새로 불러온다.
+RELOAD_SECONDS = 300
+
+
+class GroupRanking:
+    # (-포인트, 닉네임) 순으로 정렬된 목록. 포인트가 같으면 닉네임 순이다.
+
+    def __init__(self):
+        self.keys = []
+
+    def add(self, key):
+        # O(n): 이진 탐색으로 자리를 찾은 뒤 뒤쪽 원소를 한 칸씩 민다.
+        bisect.insort(self.keys, key)
+
+    def remove(self, key):
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    def rank(self, points):
+        # 나보다 포인트가 높은 사람 수 + 1 (동점이면 같은 순위)
+        return bisect.bisect_left(self.keys, (-points, '')) + 1
+
+    def top(self, n):
+        return [username for _, username in self.keys[:n]]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class Leaderboard:
+
+    def __init__(self, loader, on_reload=None):
+        # loader()는 (username, class_name, xp, points) 목록을 돌려주는 함수다.
+        # on_reload()는 DB에서 새로 불러올 때마다 불린다. (이 랭킹으로 만든 캐시를 버리게 한다)
+        self._loader = loader
+        self._on_reload = on_reload
+        self._lock = threading.Lock()
+        self._users = {}   # username -> [class_name, xp, points]
+        self._groups = {}  # class_name 또는 SCHOOL -> GroupRanking
+        self._loaded_at = None
+
+    def _ensure_loaded(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < RELOAD_SECONDS:
+            return
+        self._users = {}
+        self._groups = {}
+        for username, class_name, xp, points in self._loader():
+            self._insert(username, class_name or '', xp or 0, points or 0)
+        self._loaded_at = time.monotonic()
+        if self._on_reload is not None:
+            self._on_reload()
+
+    def _insert(self, username, class_name, xp, points):
+        self._users[username] = [class_name, xp, points]
+        key = (-points, username)
+        self._groups.setdefault(SCHOOL, GroupRanking()).add(key)
+        if class_name:
+            self._groups.setdefault(class_name, GroupRanking()).add(key)
+
+    def _delete(self, username):
+        class_name, _, points = self._users.pop(username)
+        key = (-points, username)
+        self._groups[SCHOOL].remove(key)
+        if class_name:
+            self._groups[class_name].remove(key)
+
+    def refresh(self):
+        # RELOAD_SECONDS가 지났으면 지금 DB에서 다시 불러온다.
+        with self._lock:
+            self._ensure_loaded()
+
+    def invalidate(self):
+        # 다음 조회 때 DB에서 다시 불러오게 한다.
+        with self._lock:
+            self._loaded_at = None
+
+    def upsert(self, username, class_name=None, xp=None, points=None):
+        # 가입, 반 변경, 포인트 변경을 반영한다. None인 값은 기존 값을 유지한다.
+        with self._lock:
+            self._ensure_loaded()
+            old = self._users.get(username, ['', 0, 0])
+            if username in self._users:
+                self._delete(username)
+            self._insert(
+                username,
+                old[0] if class_name is None else class_name,
+                old[1] if xp is None else xp,
+                old[2] if points is None else points,
+            )
+
+    def top(self, class_name=SCHOOL, n=5):
+        # 그룹의 상위 n명을 [(username, xp, points), ...]로 돌려준다.
+        with self._lock:
+            self._ensure_loaded()
+            group = self._groups.get(class_name)
+            if group is None:
+                return []
+            return [(u, self._users[u][1], self._users[u][2]) for u in group.top(n)]
+
+    def class_of(self, username):
+        with self._lock:
+            self._ensure_loaded()
+            user = self._users.get(username)
+            return user[0] if user else ''
+
+    def points_of(self, username):
+        with self._lock:
+            self._ensure_loaded()
+            user = self._users.get(username)
+            return user[2] if user else None
+
+    def count_ahead(self, points, class_name=SCHOOL):
+        # (그룹에서 points보다 포인트가 높은 인원, 그룹 인원) - 여러 샤드의 순위를 합칠 때 쓴다.
+        with self._lock:
+            self._ensure_loaded()
+            group = self._groups.get(class_name)
+            if group is None:
+                return 0, 0
+            return group.rank(points) - 1, len(group)
+
+    def rank_of(self, username, class_name=SCHOOL):
+        # (내 순위, 그룹 인원)을 돌려준다. 그룹에 없으면 (None, 그룹 인원)
+        with self._lock:
+            self._ensure_loaded()
+            group = self._groups.get(class_name)
+            size = len(group) if group else 0
+            user = self._users.get(username)
+            if user is None or group is None or (class_name is not SCHOOL and user[0] != class_name):
+                return None, size
+            return group.rank(user[2]), size
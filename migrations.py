@@ -0,0 +1,194 @@
+import sqlite3
+
+# money_manager.db 스키마 버전 관리.
+# DB 파일의 PRAGMA user_version에 마지막으로 적용한 마이그레이션 번호를 기록해 두고,
+# 앱이 시작될 때 그보다 큰 번호의 마이그레이션만 순서대로 한 번씩 적용한다.
+
+
+class MigrationError(RuntimeError):
+    # 마이그레이션이 실패하면 조용히 넘어가지 않고 몇 번째 단계에서 실패했는지 알려준다.
+    pass
+
+
+def _columns(c, table):
+    c.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in c.fetchall()}
+
+
+def _add_column_if_missing(c, table, column, ddl):
+    # 예전 init_db()가 이미 컬럼을 추가해 둔 DB도 있으므로, 실제로 없을 때만 ALTER TABLE을 실행한다.
+    if column not in _columns(c, table):
+        c.execute(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+
+
+def _m001_base_schema(c):
+    # 사용자, 소비 기록, 위시리스트 테이블과 게이미피케이션(XP, 포인트, 스트릭) 컬럼
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (username TEXT PRIMARY KEY, pin TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS expenses
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  username TEXT,
+                  date TEXT,
+                  item TEXT,
+                  price INTEGER,
+                  category TEXT,
+                  type TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS wishlist
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  username TEXT,
+                  item_name TEXT,
+                  target_price INTEGER,
+                  image_data BLOB)''')
+    _add_column_if_missing(c, 'users', 'last_active_date', 'TEXT')
+    _add_column_if_missing(c, 'users', 'streak_days', 'INTEGER DEFAULT 0')
+    _add_column_if_missing(c, 'users', 'xp', 'INTEGER DEFAULT 0')
+    _add_column_if_missing(c, 'users', 'points', 'INTEGER DEFAULT 0')
+
+
+def _m002_lookup_indexes(c):
+    # 소비 내역 조회(WHERE username = ? ORDER BY date DESC)와 랭킹(ORDER BY points DESC)이
+    # 테이블 전체를 훑고 정렬하지 않도록 인덱스를 만든다.
+    c.execute('CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (username, date)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_wishlist_user ON wishlist (username)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_users_points ON users (points DESC)')
+
+
+def _m003_expense_rollups(c):
+    # 사용자/월/종류/유형별 지출 요약 테이블을 만들고 기존 기록으로 채운다.
+    c.execute('''CREATE TABLE IF NOT EXISTS expense_rollups
+                 (username TEXT,
+                  month TEXT,
+                  category TEXT,
+                  type TEXT,
+                  total INTEGER NOT NULL DEFAULT 0,
+                  count INTEGER NOT NULL DEFAULT 0,
+                  PRIMARY KEY (username, month, category, type))''')
+    c.execute('''INSERT INTO expense_rollups (username, month, category, type, total, count)
+                 SELECT username, substr(date, 1, 7), category, type, SUM(price), COUNT(*)
+                 FROM expenses
+                 GROUP BY username, substr(date, 1, 7), category, type''')
+
+
+def _m004_user_class(c):
+    # 반별 랭킹을 위해 사용자에게 반(그룹) 정보를 추가한다. 반을 적지 않은 학생은 빈 문자열이다.
+    _add_column_if_missing(c, 'users', 'class_name', "TEXT NOT NULL DEFAULT ''")
+    c.execute('CREATE INDEX IF NOT EXISTS idx_users_class_points ON users (class_name, points DESC)')
+
+
+def _m005_wishlist_image_store(c):
+    # 위시리스트 사진을 BLOB에서 디스크의 사진 저장소(image_store.py)로 옮기고 DB에는 해시만 남긴다.
+    # 오래된 SQLite에서도 동작하도록 image_data 컬럼은 지우지 않고 비워 둔다.
+    import image_store
+
+    _add_column_if_missing(c, 'wishlist', 'image_hash', 'TEXT')
+    c.execute('SELECT id, image_data FROM wishlist WHERE image_data IS NOT NULL')
+    for row_id, image_data in c.fetchall():
+        c.execute('UPDATE wishlist SET image_hash = ?, image_data = NULL WHERE id = ?',
+                  (image_store.save_image(bytes(image_data)), row_id))
+
+
+
+def _m006_shard_directory(c):
+    # 반별 DB 나누기(sharding.py)의 디렉터리. 기본 DB에서만 쓰지만 모든 샤드에 같은 스키마를 둔다.
+    # 지금까지의 학생은 모두 기본 DB에 있으므로 shard_classes는 비워 두고 user_directory만 채운다.
+    c.execute('''CREATE TABLE IF NOT EXISTS shard_classes
+                 (class_name TEXT PRIMARY KEY,
+                  shard_path TEXT NOT NULL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS user_directory
+                 (username TEXT PRIMARY KEY,
+                  class_name TEXT NOT NULL DEFAULT '')''')
+    c.execute('CREATE TABLE IF NOT EXISTS shard_meta (version INTEGER NOT NULL)')
+    c.execute('INSERT INTO shard_meta (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM shard_meta)')
+    c.execute("INSERT OR IGNORE INTO user_directory (username, class_name) SELECT username, COALESCE(class_name, '') FROM users")
+
+
+def _m007_compact_expenses(c):
+    # 소비 기록을 작게 저장한다. 날짜는 'YYYY-MM-DD' 문자열 대신 epoch-day 정수(day),
+    # 종류/유형은 줄마다 반복되던 이름 대신 조회 표(expense_categories, expense_types)의 코드로 바꾼다.
+    # 줄과 인덱스가 작아져 한 페이지에 더 많은 기록이 들어가고, 기간 검색은 정수 비교가 된다.
+    # id는 그대로 옮기므로 (date, id) 페이지 위치와 샤드 이동 중의 id 기준도 그대로다.
+    from storage.base import EXPENSE_CATEGORIES, EXPENSE_TYPES
+
+    for table, labels, column in (('expense_categories', EXPENSE_CATEGORIES, 'category'),
+                                  ('expense_types', EXPENSE_TYPES, 'type')):
+        c.execute(f'''CREATE TABLE IF NOT EXISTS {table}
+                      (id INTEGER PRIMARY KEY,
+                       label TEXT NOT NULL UNIQUE)''')
+        c.executemany(f'INSERT OR IGNORE INTO {table} (label) VALUES (?)', [(label,) for label in labels])
+        # 선택지에 없는 예전 이름도 잃지 않도록 뒤에 이어서 코드를 준다.
+        c.execute(f'''INSERT OR IGNORE INTO {table} (label)
+                      SELECT DISTINCT {column} FROM expenses WHERE {column} IS NOT NULL ORDER BY {column}''')
+    c.execute('''CREATE TABLE expenses_compact
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  username TEXT,
+                  day INTEGER,
+                  item TEXT,
+                  price INTEGER,
+                  category_id INTEGER REFERENCES expense_categories (id),
+                  type_id INTEGER REFERENCES expense_types (id))''')
+    c.execute('''INSERT INTO expenses_compact (id, username, day, item, price, category_id, type_id)
+                 SELECT e.id, e.username, CAST(julianday(e.date) - 2440587.5 AS INTEGER), e.item, e.price, cat.id, typ.id
+                 FROM expenses e
+                 LEFT JOIN expense_categories cat ON cat.label = e.category
+                 LEFT JOIN expense_types typ ON typ.label = e.type''')
+    # 지워진 기록의 id가 다시 쓰이지 않도록 AUTOINCREMENT 번호도 이어받는다.
+    c.execute("DELETE FROM sqlite_sequence WHERE name = 'expenses_compact'")
+    c.execute("INSERT INTO sqlite_sequence (name, seq) SELECT 'expenses_compact', seq FROM sqlite_sequence WHERE name = 'expenses'")
+    # 옛 표를 지우면 idx_expenses_user_date도 함께 지워진다. 줄어든 파일 크기는 VACUUM 후에 돌아온다.
+    c.execute('DROP TABLE expenses')
+    c.execute('ALTER TABLE expenses_compact RENAME TO expenses')
+    # id는 (day, id) 페이지 순서를 정렬 없이 읽기 위해, price는 날짜별 합계를
+    # 표를 읽지 않고 인덱스만으로 계산하기 위해 넣는다.
+    c.execute('CREATE INDEX IF NOT EXISTS idx_expenses_user_day ON expenses (username, day, id, price)')
+
+
+def _m008_expense_archive(c):
+    # 닫힌 달 기록 보관(archive.py)의 목록. 학생의 어느 달 기록이 어느 보관 파일에 있는지 적는다.
+    # 학생 x 달마다 한 줄이라 작다. 합계는 적지 않고, 월간 요약 검증(rollups.py)은 파일을 직접 읽어 맞춰 본다.
+    c.execute('''CREATE TABLE IF NOT EXISTS expense_archive
+                 (username TEXT NOT NULL,
+                  month TEXT NOT NULL,
+                  path TEXT NOT NULL,
+                  PRIMARY KEY (username, month, path)) WITHOUT ROWID''')
+
+
+# (버전 번호, 설명, 적용 함수) - 새 마이그레이션은 항상 목록 끝에 다음 번호로 추가한다.
+MIGRATIONS = [
+    (1, '기본 테이블과 게이미피케이션 컬럼', _m001_base_schema),
+    (2, '소비 기록/위시리스트/랭킹 인덱스', _m002_lookup_indexes),
+    (3, '월간 지출 요약 테이블', _m003_expense_rollups),
+    (4, '사용자 반(그룹) 컬럼', _m004_user_class),
+    (5, '위시리스트 사진을 사진 저장소로 이동', _m005_wishlist_image_store),
+    (6, '반별 DB 나누기 디렉터리', _m006_shard_directory),
+    (7, '소비 기록 날짜 정수화와 종류/유형 코드 표', _m007_compact_expenses),
+    (8, '닫힌 달 기록 보관 목록', _m008_expense_archive),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    # 아직 적용되지 않은 마이그레이션을 하나씩 트랜잭션으로 적용하고, 적용한 번호 목록을 돌려준다.
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if get_version(conn) >= version:
+            continue
+        c = conn.cursor()
+        try:
+            # 다른 프로세스가 동시에 마이그레이션하지 않도록 쓰기 잠금을 먼저 잡고 버전을 다시 확인한다.
+            c.execute('BEGIN IMMEDIATE')
+            if get_version(conn) >= version:
+                conn.rollback()
+                continue
+            apply(c)
+            c.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            raise MigrationError(f'마이그레이션 {version} ({description}) 실패: {e}') from e
+        applied.append(version)
+    return applied
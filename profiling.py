@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# 재실행(rerun) 한 번 동안 어디에 시간이 걸렸는지 기록하는 계측 도구.
+# DB 함수, 화면(섹션), 차트 만들기 시간을 재고 SQL 문장 수와 읽은 줄 수를 센다.
+# 기록은 스크립트를 실행하는 스레드마다 따로 모으며, 꺼져 있으면 함수 호출 한 번과 None 확인만 하고 지나간다.
+
+logger = logging.getLogger('money_manager.profile')
+
+# 환경변수 MONEY_MANAGER_PROFILE=1 이면 모든 세션을 계측하고 결과를 로그로 남긴다.
+PROFILE_ALL = bool(os.environ.get('MONEY_MANAGER_PROFILE'))
+
+# 사이드바의 계측 패널을 볼 수 있는 닉네임 (쉼표로 구분, 예: MONEY_MANAGER_ADMINS=선생님,관리자)
+ADMINS = {name.strip() for name in os.environ.get('MONEY_MANAGER_ADMINS', '').split(',') if name.strip()}
+
+_local = threading.local()
+
+# 서버 프로세스가 처음 화면을 그리기까지 걸린 시간 (이름 -> ms). 프로세스마다 처음 한 번만 기록한다.
+_startup = {}
+_startup_lock = threading.Lock()
+
+
+class RunRecorder:
+    # 재실행 한 번의 계측 결과
+
+    def __init__(self, label=''):
+        self.label = label
+        self.started = time.perf_counter()
+        self.spans = {}  # 이름 -> [호출 수, 누적 초]
+        self.queries = 0
+        self.rows = 0
+
+    def add_span(self, name, seconds):
+        span = self.spans.setdefault(name, [0, 0.0])
+        span[0] += 1
+        span[1] += seconds
+
+    def to_dict(self):
+        return {
+            'label': self.label,
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'queries': self.queries,
+            'rows': self.rows,
+            'spans': {name: {'calls': calls, 'ms': round(seconds * 1000, 3)}
+                      for name, (calls, seconds) in sorted(self.spans.items(), key=lambda kv: -kv[1][1])},
+        }
+
+
+def is_admin(username):
+    return username in ADMINS
+
+
+def start_run(enabled=False, label=''):
+    # 스크립트 맨 위에서 부른다. 계측이 꺼져 있으면 이 스레드의 기록기를 비운다.
+    _local.recorder = RunRecorder(label) if (enabled or PROFILE_ALL) else None
+    return _local.recorder
+
+
+def current():
+    return getattr(_local, 'recorder', None)
+
+
+def finish_run():
+    # 스크립트 맨 끝에서 부른다. 결과를 구조화된 로그(JSON 한 줄)로 남기고 사전으로 돌려준다.
+    recorder = current()
+    if recorder is None:
+        return None
+    _local.recorder = None
+    result = recorder.to_dict()
+    logger.info(json.dumps(result, ensure_ascii=False))
+    return result
+
+
+def startup_mark(name, started):
+    # 시작 구간(예: 'imports', 'login_form')을 기록한다. started는 스크립트 맨 위에서 잰 time.perf_counter() 값
+    # 이미 기록한 구간이면 아무것도 하지 않으므로 재실행마다 불러도 된다.
+    with _startup_lock:
+        if name in _startup:
+            return
+        ms = _startup[name] = round((time.perf_counter() - started) * 1000, 3)
+    logger.info(json.dumps({'startup': name, 'ms': ms}, ensure_ascii=False))
+
+
+def startup_stats():
+    with _startup_lock:
+        return dict(_startup)
+
+
+@contextmanager
+def span(name):
+    # with profiling.span("chart:pie"): ... 블록의 시간을 잰다.
+    recorder = current()
+    if recorder is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add_span(name, time.perf_counter() - started)
+
+
+def _count_rows(result):
+    if result is None:
+        return 0
+    if isinstance(result, tuple):
+        return 1
+    try:
+        return len(result)
+    except TypeError:
+        return 1
+
+
+def timed(name, rows=_count_rows):
+    # DB 함수용 데코레이터. 시간과 함께, 돌려준 결과의 줄 수를 rows(result)로 세어 더한다.
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = current()
+            if recorder is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            recorder.add_span(name, time.perf_counter() - started)
+            recorder.rows += rows(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def on_sql(statement):
+    # sqlite3 연결의 trace callback. 실행된 SQL 문장 수를 센다.
+    recorder = current()
+    if recorder is not None:
+        recorder.queries += 1
@@ -0,0 +1,102 @@
+import argparse
+import sys
+
+# 사용자별 월간 지출 요약(rollup) 테이블 관리.
+# expense_rollups에는 (사용자, 월, 종류, 유형)마다 합계와 건수가 저장되어 있어서,
+# 차트와 AI 코치는 전체 소비 기록 대신 수십 줄짜리 요약만 읽으면 된다.
+# 소비 기록을 추가/수정/삭제하는 코드는 같은 트랜잭션 안에서 apply_delta()를 불러 요약을 맞춰야 한다.
+
+# expenses는 날짜를 epoch-day, 종류/유형을 코드로 저장하므로(migrations.py의 7번) 요약의 달과 이름으로 바꿔 묶는다.
+# Parquet 파일로 보관한 기록(archive.py)은 여기에 없으므로 _actual()이 보관 파일의 합계를 더한다.
+AGGREGATE_SQL = '''SELECT e.username, strftime('%Y-%m', e.day * 86400, 'unixepoch') AS month,
+                          cat.label AS category, typ.label AS type,
+                          SUM(e.price) AS total, COUNT(*) AS count
+                   FROM expenses e
+                   LEFT JOIN expense_categories cat ON cat.id = e.category_id
+                   LEFT JOIN expense_types typ ON typ.id = e.type_id
+                   GROUP BY e.username, month, e.category_id, e.type_id'''
+
+
+def month_key(date):
+    # '2024-03-15' 또는 date 객체 -> '2024-03'
+    return str(date)[:7]
+
+
+def apply_delta(c, username, date, category, type_val, amount, count=1):
+    # 소비 기록 한 건이 늘거나(+) 줄어든(-) 만큼 요약 줄을 고친다.
+    # 수정은 이전 값으로 -1건, 새 값으로 +1건을 차례로 적용하면 된다.
+    c.execute('''INSERT INTO expense_rollups (username, month, category, type, total, count)
+                 VALUES (?, ?, ?, ?, ?, ?)
+                 ON CONFLICT (username, month, category, type)
+                 DO UPDATE SET total = total + excluded.total, count = count + excluded.count''',
+              (username, month_key(date), category, type_val, amount, count))
+    if count < 0:
+        c.execute('''DELETE FROM expense_rollups
+                     WHERE username = ? AND month = ? AND category = ? AND type = ? AND count <= 0''',
+                  (username, month_key(date), category, type_val))
+
+
+def _actual(c):
+    # expenses와 보관 파일에서 새로 계산한 {(username, month, category, type): (합계, 건수)}
+    c.execute(AGGREGATE_SQL)
+    actual = {row[:4]: row[4:] for row in c.fetchall()}
+    if c.execute('SELECT 1 FROM expense_archive LIMIT 1').fetchone():
+        import archive
+        for key, (total, count) in archive.archived_totals(c).items():
+            old_total, old_count = actual.get(key, (0, 0))
+            actual[key] = (old_total + total, old_count + count)
+    return actual
+
+
+def rebuild(conn):
+    # expenses 테이블과 보관 파일에서 요약을 처음부터 다시 계산한다.
+    c = conn.cursor()
+    c.execute('BEGIN IMMEDIATE')
+    c.execute('DELETE FROM expense_rollups')
+    c.executemany('''INSERT INTO expense_rollups (username, month, category, type, total, count)
+                     VALUES (?, ?, ?, ?, ?, ?)''', [(*key, *value) for key, value in _actual(c).items()])
+    conn.commit()
+
+
+def verify(conn):
+    # 저장된 요약과 expenses에서 새로 계산한 값을 비교해 어긋난 줄 목록을 돌려준다.
+    # 각 항목: (username, month, category, type, 저장된 (합계, 건수), 실제 (합계, 건수))
+    c = conn.cursor()
+    c.execute('SELECT username, month, category, type, total, count FROM expense_rollups')
+    stored = {row[:4]: row[4:] for row in c.fetchall()}
+    actual = _actual(c)
+    drift = []
+    for key in sorted(set(stored) | set(actual), key=lambda k: tuple(str(v) for v in k)):
+        if stored.get(key) != actual.get(key):
+            drift.append((*key, stored.get(key), actual.get(key)))
+    return drift
+
+
+def main(argv=None):
+    # 사용법: python rollups.py verify   (어긋난 요약만 보고)
+    #         python rollups.py rebuild  (요약을 다시 계산한 뒤 검증)
+    import archive
+    import database
+
+    parser = argparse.ArgumentParser(description='지출 요약(rollup) 테이블 검증/재계산')
+    parser.add_argument('command', choices=['verify', 'rebuild'])
+    parser.add_argument('--db', default=database.DB_PATH, help='DB 파일 경로 (기본: money_manager.db)')
+    parser.add_argument('--archive-dir', default=archive.ARCHIVE_DIR, help='보관 파일 폴더 (archive.py)')
+    args = parser.parse_args(argv)
+
+    database.DB_PATH = args.db
+    archive.ARCHIVE_DIR = args.archive_dir
+    database.init_db()
+    with database.get_connection() as conn:
+        if args.command == 'rebuild':
+            rebuild(conn)
+        drift = verify(conn)
+
+    for username, month, category, type_val, stored, actual in drift:
+        print(f'{username} {month} {category} {type_val}: 저장={stored} 실제={actual}')
+    print(f'어긋난 요약 {len(drift)}줄')
+    return 1 if drift else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
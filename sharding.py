@@ -0,0 +1,284 @@
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+# 반별 DB 나누기(sharding).
+# 모든 학교의 기록이 money_manager.db 하나에 있으면 모든 쓰기가 SQLite 쓰기 잠금 하나를 두고 줄을 선다.
+# 그래서 반(또는 학교)마다 DB 파일(샤드)을 따로 둘 수 있게 하고, 어느 반이 어느 파일에 있는지는
+# 기본 DB(money_manager.db, '디렉터리')의 shard_classes 표에 적어 둔다.
+# - 디렉터리에 없는 반과 반을 적지 않은 학생은 기본 DB에 있다. (샤드를 쓰지 않으면 지금과 똑같다)
+# - 환경변수 MONEY_MANAGER_SHARD_DIR를 설정하면 새로 생긴 반마다 그 폴더에 DB 파일을 따로 만든다.
+# - 반을 다른 파일로 옮길 때는 `python sharding.py move 3반 shards/학교A.db` (앱을 끄지 않아도 된다)
+# 사용법: python sharding.py list
+
+SHARD_DIR = os.environ.get('MONEY_MANAGER_SHARD_DIR', '')
+
+# 사용자별로 옮기는 테이블. expenses와 wishlist는 옮기는 DB에서 id를 새로 받는다.
+USER_TABLES = ('users', 'expense_rollups', 'wishlist', 'expenses', 'expense_archive')
+
+
+def class_shard_path(class_name, shard_dir=SHARD_DIR):
+    # 새 반의 DB 파일 경로. 파일 이름에 쓸 수 없는 글자는 '_'로 바꾼다. ('3학년 2반' -> '3학년_2반.db')
+    name = re.sub(r'[^\w-]+', '_', class_name.strip()).strip('_') or 'class'
+    return os.path.join(shard_dir, f'{name}.db')
+
+
+class ShardRouter:
+    # 닉네임/반 -> DB 파일 경로를 알려준다.
+    # 디렉터리 내용은 메모리에 들고 있고, 다른 프로세스(옮기기 도구 등)가 디렉터리를 바꾸면
+    # PRAGMA data_version과 shard_meta.version으로 알아채고 다시 읽는다. (조회마다 PRAGMA 한 번)
+
+    def __init__(self, directory_path):
+        # directory_path()는 기본 DB 경로를 돌려주는 함수다. (database.DB_PATH는 실행 중에 바뀔 수 있다)
+        self._directory_path = directory_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_path = None
+        self._data_version = None
+        self._version = None
+        self._user_class = {}   # username -> class_name
+        self._class_shard = {}  # class_name -> 샤드 경로
+        self._listeners = []
+
+    def on_change(self, listener):
+        # 디렉터리가 바뀌어 다시 읽을 때마다 listener()를 부른다. (랭킹 캐시 무효화 등)
+        self._listeners.append(listener)
+
+    def _resolve(self, shard_path):
+        # 디렉터리에는 기본 DB 폴더 기준 상대 경로를 적는다. 빈 문자열은 기본 DB 자신이다.
+        home = self._directory_path()
+        if not shard_path:
+            return home
+        if os.path.isabs(shard_path):
+            return shard_path
+        return os.path.join(os.path.dirname(home), shard_path)
+
+    def _refresh(self):
+        # 잠금을 잡은 채로 부른다. 디렉터리가 바뀌었으면 True
+        path = self._directory_path()
+        if self._conn_path != path:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn_path = path
+            self._data_version = self._version = None
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self._data_version:
+            return False
+        self._data_version = data_version
+        version = self._conn.execute('SELECT version FROM shard_meta').fetchone()[0]
+        if version == self._version:
+            return False
+        self._user_class = dict(self._conn.execute('SELECT username, class_name FROM user_directory'))
+        self._class_shard = {class_name: self._resolve(shard_path) for class_name, shard_path
+                             in self._conn.execute('SELECT class_name, shard_path FROM shard_classes')}
+        self._version = version
+        return True
+
+    def _call(self, func):
+        with self._lock:
+            changed = self._refresh()
+            result = func()
+        if changed:
+            for listener in self._listeners:
+                listener()
+        return result
+
+    def reload(self):
+        # 다음 조회 때 디렉터리를 반드시 다시 읽게 한다.
+        with self._lock:
+            self._data_version = self._version = None
+        return self._call(lambda: None)
+
+    def shard_of_class(self, class_name):
+        return self._call(lambda: self._class_shard.get(class_name or '', self._directory_path()))
+
+    def shard_of_user(self, username):
+        def lookup():
+            class_name = self._user_class.get(username, '')
+            return self._class_shard.get(class_name, self._directory_path())
+        return self._call(lookup)
+
+    def class_assignment(self, class_name):
+        # 이 반의 학생이 들어갈 (샤드 경로, 디렉터리에 새로 적어야 할 상대 경로 또는 None)
+        def lookup():
+            if not class_name or class_name in self._class_shard or not SHARD_DIR:
+                return self._class_shard.get(class_name, self._directory_path()), None
+            relative = class_shard_path(class_name)
+            return self._resolve(relative), relative
+        return self._call(lookup)
+
+    def shards(self):
+        # 기본 DB를 포함한 모든 샤드 경로 (기본 DB가 항상 처음)
+        def collect():
+            home = self._directory_path()
+            return [home] + sorted(set(self._class_shard.values()) - {home})
+        return self._call(collect)
+
+
+# --- 디렉터리 쓰기 (열린 트랜잭션의 커서 c 안에서 부른다) ---
+def _bump_directory(c):
+    c.execute('UPDATE shard_meta SET version = version + 1')
+
+
+def set_user_class(c, username, class_name, new_shard_path=None):
+    # 학생의 반을 디렉터리에 적는다. new_shard_path가 있으면 그 반을 새 샤드에 배정한다.
+    if new_shard_path is not None:
+        c.execute('INSERT OR IGNORE INTO shard_classes (class_name, shard_path) VALUES (?, ?)',
+                  (class_name, new_shard_path))
+    c.execute('INSERT OR REPLACE INTO user_directory (username, class_name) VALUES (?, ?)', (username, class_name))
+    _bump_directory(c)
+
+
+def set_class_shard(c, class_name, shard_path):
+    c.execute('INSERT OR REPLACE INTO shard_classes (class_name, shard_path) VALUES (?, ?)', (class_name, shard_path))
+    _bump_directory(c)
+
+
+# --- 사용자 옮기기 ---
+def _columns(conn, table, skip_id):
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    return [col for col in columns if not (skip_id and col == 'id')]
+
+
+def _lookup_remap(src, dst, columns):
+    # 종류/유형 코드는 DB마다 다를 수 있다. (선택지에 없던 이름은 DB마다 처음 저장된 순서대로 코드를 받는다)
+    # src의 코드를 같은 이름의 dst 코드로 바꾸는 {컬럼 위치: {src 코드: dst 코드}}를 만든다. 없는 이름은 dst에 추가한다.
+    remap = {}
+    for column, table in (('category_id', 'expense_categories'), ('type_id', 'expense_types')):
+        codes = {}
+        for code, label in src.execute(f'SELECT id, label FROM {table}').fetchall():
+            dst.execute(f'INSERT OR IGNORE INTO {table} (label) VALUES (?)', (label,))
+            codes[code] = dst.execute(f'SELECT id FROM {table} WHERE label = ?', (label,)).fetchone()[0]
+        if any(code != new_code for code, new_code in codes.items()):
+            remap[columns.index(column)] = codes
+    return remap
+
+
+def _copy_rows(src, dst, table, usernames, min_id=None):
+    # src의 해당 사용자 줄을 dst로 복사하고, 복사한 마지막 id(없으면 min_id)를 돌려준다.
+    # expenses/wishlist는 id 순서대로 넣어 (date, id) 페이지 순서가 그대로 유지되게 한다.
+    has_id = table in ('expenses', 'wishlist')
+    columns = _columns(src, table, skip_id=has_id)
+    marks = ','.join('?' * len(usernames))
+    query = f"SELECT {', '.join(columns)}{', id' if has_id else ''} FROM {table} WHERE username IN ({marks})"
+    params = list(usernames)
+    if min_id is not None:
+        query += ' AND id > ?'
+        params.append(min_id)
+    if has_id:
+        query += ' ORDER BY id'
+    last_id = min_id
+    insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({','.join('?' * len(columns))})"
+    remap = _lookup_remap(src, dst, columns) if table == 'expenses' else {}
+    cursor = src.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            break
+        if has_id:
+            last_id = rows[-1][-1]
+            rows = [row[:-1] for row in rows]
+        if remap:
+            rows = [tuple(remap[i].get(value, value) if i in remap else value for i, value in enumerate(row))
+                    for row in rows]
+        dst.executemany(insert, rows)
+    return last_id
+
+
+def _delete_rows(conn, usernames):
+    marks = ','.join('?' * len(usernames))
+    for table in USER_TABLES:
+        conn.execute(f'DELETE FROM {table} WHERE username IN ({marks})', list(usernames))
+
+
+def move_users(usernames, src_path, dst_path, directory_path, connect, flip):
+    # 학생들의 모든 기록을 src 샤드에서 dst 샤드로 옮기고 flip(c)로 디렉터리를 바꾼다.
+    # 1단계: 잠금 없이 소비 기록 대부분을 복사한다. (그동안 앱은 src에서 평소대로 읽고 쓴다)
+    # 2단계: src 쓰기 잠금(BEGIN IMMEDIATE)을 잡고 그 사이 늘어난 기록과 작은 표(사용자, 요약, 위시리스트)를
+    #        복사한 뒤 디렉터리를 바꾸고 src에서 지운다. 잠금은 2단계 동안만 잡으며,
+    #        그 사이 src에 쓰려던 요청은 잠깐 기다렸다가 UserNotFound(storage/base.py)를 받고 dst로 다시 쓴다.
+    # connect(path)는 `with connect(path) as conn:` 형태의 연결을 돌려주는 함수다. (database.get_connection)
+    usernames = list(usernames)
+    if not usernames or src_path == dst_path:
+        return 0
+    with connect(src_path) as src, connect(dst_path) as dst:
+        # 지난번에 실패한 옮기기가 남긴 줄이 있으면 먼저 지운다.
+        _delete_rows(dst, usernames)
+        last_id = _copy_rows(src, dst, 'expenses', usernames)
+        dst.commit()
+        src.rollback()  # 1단계의 읽기 스냅숏을 놓는다.
+
+        src.execute('BEGIN IMMEDIATE')
+        _copy_rows(src, dst, 'expenses', usernames, min_id=last_id)
+        # 보관 목록도 옮긴다. 보관 파일(archive.py)은 DB와 상관없는 폴더에 있으므로 그대로 둔다.
+        for table in ('users', 'expense_rollups', 'wishlist', 'expense_archive'):
+            _copy_rows(src, dst, table, usernames)
+        if directory_path == dst_path:
+            flip(dst.cursor())
+        dst.commit()
+        if directory_path == src_path:
+            flip(src.cursor())
+        elif directory_path != dst_path:
+            with connect(directory_path) as directory:
+                flip(directory.cursor())
+                directory.commit()
+        _delete_rows(src, usernames)
+        src.commit()
+    return len(usernames)
+
+
+def move_class(class_name, dst_relative):
+    # 반 전체를 다른 샤드로 옮긴다. dst_relative는 기본 DB 폴더 기준 경로 (''이면 기본 DB)
+    import database
+
+    router = database.get_router()
+    src_path = router.shard_of_class(class_name)
+    dst_path = router._resolve(dst_relative)
+    database.prepare_shard(dst_path)
+    with database.get_connection(src_path) as conn:
+        usernames = [row[0] for row in conn.execute('SELECT username FROM users WHERE class_name = ?', (class_name,))]
+    moved = move_users(usernames, src_path, dst_path, database.DB_PATH, database.get_connection,
+                       lambda c: set_class_shard(c, class_name, dst_relative))
+    if not moved:
+        # 옮길 학생이 없어도 앞으로 가입할 학생이 dst로 가도록 배정은 바꾼다.
+        with database.get_connection(database.DB_PATH) as conn:
+            set_class_shard(conn.cursor(), class_name, dst_relative)
+            conn.commit()
+    router.reload()
+    return moved
+
+
+def main(argv=None):
+    import database
+
+    parser = argparse.ArgumentParser(description='반별 DB(샤드) 관리')
+    parser.add_argument('--db', default=database.DB_PATH, help='기본 DB(디렉터리) 경로 (기본: money_manager.db)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='샤드별 반과 학생 수 보기')
+    move = sub.add_parser('move', help='반 하나를 다른 샤드로 옮기기 (앱을 끄지 않아도 된다)')
+    move.add_argument('class_name', help='옮길 반 이름')
+    move.add_argument('shard', help="옮길 DB 파일 (기본 DB 폴더 기준 경로, 기본 DB로 돌아가려면 '')")
+    args = parser.parse_args(argv)
+
+    database.DB_PATH = args.db
+    database.init_db()
+    if args.command == 'move':
+        moved = move_class(args.class_name, args.shard)
+        print(f"{args.class_name}: 학생 {moved}명을 {args.shard or database.DB_PATH}(으)로 옮겼어요.")
+        return 0
+    for path in database.get_router().shards():
+        with database.get_connection(path) as conn:
+            rows = conn.execute('''SELECT class_name, COUNT(*) FROM users
+                                   GROUP BY class_name ORDER BY class_name''').fetchall()
+        print(path)
+        for class_name, count in rows:
+            print(f"  {class_name or '(반 없음)'}: {count}명")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
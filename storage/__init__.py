@@ -0,0 +1,21 @@
+from storage.base import EXPENSE_FIELDS, Storage, UserNotFound
+from storage.memory import MemoryStorage
+from storage.sqlite import SQLiteStorage
+
+# 저장소(백엔드) 모음. 주소 하나로 저장소를 고른다.
+# - sqlite:///money_manager.db   SQLite 파일 (기본)
+# - memory://                    메모리 (테스트/벤치마크용)
+# - postgresql://user:pw@host/db PostgreSQL (psycopg 3 필요)
+
+
+def open_storage(url):
+    if url.startswith('sqlite:///'):
+        return SQLiteStorage(url[len('sqlite:///'):])
+    if url.startswith('memory:'):
+        return MemoryStorage()
+    if url.startswith(('postgresql://', 'postgres://')):
+        # psycopg가 없는 환경에서도 다른 저장소는 쓸 수 있도록 필요할 때만 불러온다.
+        from storage.postgres import PostgresStorage
+        return PostgresStorage(url)
+    raise ValueError(f"알 수 없는 저장소 주소: {url!r} (sqlite:///파일, memory://, postgresql://...)")
+
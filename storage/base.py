@@ -0,0 +1,164 @@
+from datetime import date, timedelta
+
+# 저장소(백엔드) 공통 인터페이스.
+# database.py는 캐시, 랭킹, 샤드 찾기, 계측을 맡고 실제 읽기/쓰기는 이 인터페이스를 구현한 저장소에 맡긴다.
+# 구현: SQLiteStorage(기본, storage/sqlite.py), MemoryStorage(테스트/벤치마크용, storage/memory.py),
+#       PostgresStorage(교육청 서버용, storage/postgres.py)
+# 새 구현은 `python -m storage.conformance --url ...`로 같은 동작을 하는지 확인한다.
+#
+# 주고받는 값은 pandas 없이 기본 자료형만 쓴다.
+# - 날짜는 'YYYY-MM-DD' 문자열, 달은 'YYYY-MM' 문자열 (expense_columns만 epoch-day 정수, 아래 참고)
+# - 소비 기록 한 줄은 EXPENSE_FIELDS 순서의 튜플
+# - 종류/유형은 화면에 보이는 이름 그대로 주고받는다. 저장소가 안에서 작은 코드로 바꿔 저장해도 된다.
+
+EXPENSE_FIELDS = ('id', 'username', 'date', 'item', 'price', 'category', 'type')
+
+# 소비 기록 입력 폼의 선택지. 일괄 불러오기(importer.py)도 이 값으로 종류/유형을 검사한다.
+# SQLite 저장소는 이 순서대로 종류/유형 코드(1, 2, ...)를 매긴다. (migrations.py의 7번)
+# 새 선택지는 목록 끝에 추가한다. 처음 보는 이름은 저장될 때 다음 코드를 받는다.
+EXPENSE_CATEGORIES = ["간식 🍪", "학용품 ✏️", "장난감 🤖", "교통비 🚌", "기타 🎸"]
+EXPENSE_TYPES = ["필요해요 (Need) ✅", "원해요 (Want) 💖"]
+
+# epoch-day: 1970-01-01부터 센 날 수. 날짜를 정수 하나로 저장하고 비교한다.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_epoch_day(value):
+    # 'YYYY-MM-DD' 문자열 또는 date -> epoch-day 정수
+    if not isinstance(value, date):
+        value = date.fromisoformat(str(value))
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def from_epoch_day(day):
+    # epoch-day 정수 -> date
+    return date.fromordinal(EPOCH_ORDINAL + day)
+
+
+class UserNotFound(LookupError):
+    # 쓰려던 사용자가 이 저장소에 없다. (가입하지 않았거나, 샤드를 쓸 때는 다른 샤드로 옮겨졌다)
+    # 이 예외가 나면 그 쓰기 전체가 취소된 상태다.
+    pass
+
+
+def next_streak(streak_days, last_active_date, today):
+    # 활동 보상 때의 새 연속 기록일. (SQL 저장소는 같은 규칙을 UPDATE 문 안의 CASE로 계산한다)
+    # today는 date, last_active_date는 'YYYY-MM-DD' 문자열 또는 None
+    if last_active_date == str(today):
+        return streak_days or 0          # 오늘 이미 기록함
+    if last_active_date == str(today - timedelta(days=1)):
+        return (streak_days or 0) + 1    # 연속 기록
+    return 1                             # 첫 기록이거나 끊김, 다시 시작
+
+
+def rewarded(count, per_row):
+    # 한 묶음에서 사용자의 줄이 count개일 때 보상을 몇 번 줄지. (일괄 불러오기는 묶음마다 한 번)
+    return count if per_row else 1
+
+
+def group_expense_rows(rows):
+    # 소비 기록 묶음 -> ({(username, month, category, type): (합계, 건수)}, {username: 건수})
+    # 저장소는 이 값으로 월간 요약과 보상을 사용자별로 한 번씩만 고친다.
+    deltas = {}
+    counts = {}
+    for username, date, _, price, category, type_val in rows:
+        key = (username, date[:7], category, type_val)
+        total, count = deltas.get(key, (0, 0))
+        deltas[key] = (total + price, count + 1)
+        counts[username] = counts.get(username, 0) + 1
+    return deltas, counts
+
+
+def code_expense_rows(rows):
+    # [(epoch-day, price, 종류 이름, 유형 이름), ...] -> expense_columns()가 돌려줄 (줄, 종류 이름표, 유형 이름표)
+    # 코드를 따로 저장하지 않는 저장소가 쓴다. 코드는 선택지 순서로 1부터, 처음 보는 이름은 그 뒤에 붙인다.
+    labels = ([None, *EXPENSE_CATEGORIES], [None, *EXPENSE_TYPES])
+    codes = tuple({label: code for code, label in enumerate(names)} for names in labels)
+
+    def code_of(which, label):
+        code = codes[which].get(label)
+        if code is None:
+            code = codes[which][label] = len(labels[which])
+            labels[which].append(label)
+        return code
+
+    coded = [(day, price or 0, code_of(0, category), code_of(1, type_val)) for day, price, category, type_val in rows]
+    return coded, labels[0], labels[1]
+
+
+class Storage:
+    # 모든 메서드는 여러 스레드에서 동시에 불릴 수 있다.
+
+    # --- 준비/정리 ---
+    def migrate(self):
+        # 테이블을 만들거나 최신 스키마로 올린다. 여러 번 불러도 된다.
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    # --- 사용자 ---
+    def get_user(self, username):
+        # (pin, class_name) 또는 None
+        raise NotImplementedError
+
+    def create_user(self, username, pin, class_name=''):
+        raise NotImplementedError
+
+    def set_user_class(self, username, class_name):
+        raise NotImplementedError
+
+    def get_user_stats(self, username):
+        # (streak_days, xp, points). 없는 사용자는 (0, 0, 0)
+        raise NotImplementedError
+
+    def update_activity(self, username, xp_gain, points_gain, today):
+        # 보상을 지급하고 새 (streak_days, xp, points)를 돌려준다. 없는 사용자면 UserNotFound
+        raise NotImplementedError
+
+    def usernames(self):
+        raise NotImplementedError
+
+    # --- 랭킹 ---
+    def leaderboard_rows(self):
+        # 모든 사용자의 (username, class_name, xp, points). 메모리 랭킹(leaderboard.py)을 채울 때 쓴다.
+        raise NotImplementedError
+
+    # --- 소비 기록 ---
+    def add_expenses(self, rows, xp_per_row, points_per_row, today, per_row=True):
+        # [(username, 'YYYY-MM-DD', item, price, category, type), ...]을 한 트랜잭션으로 저장한다.
+        # 기록, 월간 요약, 보상을 함께 고치고 사용자별 새 (streak_days, xp, points)를 돌려준다.
+        # 보상은 per_row면 사용자의 줄 수만큼, 아니면 이 묶음에서 사용자마다 한 번 (rewarded)
+        # 묶음 안에 없는 사용자가 있으면 아무것도 저장하지 않고 UserNotFound
+        raise NotImplementedError
+
+    def all_expenses(self, username):
+        # 사용자의 모든 기록 (EXPENSE_FIELDS 튜플) 날짜 내림차순
+        raise NotImplementedError
+
+    def expense_page(self, username, after=None, limit=20, columns=EXPENSE_FIELDS):
+        # (date, id) 내림차순으로 after(= (date, id)) 다음부터 limit줄. 각 줄은 columns(EXPENSE_FIELDS 중 일부) 순서의 튜플
+        # 화면에 필요한 열만 읽도록 저장소가 고른 열만 가져온다. (종류/유형을 빼면 조회 표와 잇지 않는다)
+        raise NotImplementedError
+
+    def expense_columns(self, username):
+        # 분석용 열 묶음(expense_columns.py)의 재료: (줄, 종류 이름표, 유형 이름표)
+        # 줄은 [(epoch-day, price, 종류 코드, 유형 코드), ...] (date, id) 오름차순, 이름표는 코드 -> 이름 목록 (0은 None)
+        raise NotImplementedError
+
+    def archived_parts(self, username):
+        # 보관(archive.py)된 달의 [(month, 파일 경로), ...] 달 내림차순. 보관을 쓰지 않는 저장소는 빈 목록
+        return []
+
+    def spending_summary(self, username, month=None):
+        # [(category, type, total, count), ...] 합계 내림차순. month를 주면 그 달만
+        raise NotImplementedError
+
+    # --- 위시리스트 ---
+    def set_wishlist(self, username, item_name, target_price, image_hash):
+        # 목표는 한 사람에 하나다. 기존 목표를 바꾼다.
+        raise NotImplementedError
+
+    def get_wishlist(self, username):
+        # (id, username, item_name, target_price, image_hash) 또는 None
+        raise NotImplementedError
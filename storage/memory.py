@@ -0,0 +1,129 @@
+import threading
+
+from storage.base import (EXPENSE_FIELDS, Storage, UserNotFound, code_expense_rows, group_expense_rows, next_streak,
+                          rewarded, to_epoch_day)
+
+# 메모리 저장소. 파일을 만들지 않고 프로세스가 끝나면 사라진다.
+# 테스트와 벤치마크에서 디스크 I/O 없이 앱 로직만 재고 싶을 때 쓴다. (MONEY_MANAGER_STORAGE=memory://)
+# 잠금 하나로 모든 읽기/쓰기를 직렬화하므로, 쓰기 한 번은 SQLite 트랜잭션처럼 전부 되거나 전부 안 된다.
+
+
+class MemoryStorage(Storage):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}     # username -> {'pin', 'class_name', 'streak_days', 'last_active_date', 'xp', 'points'}
+        self._expenses = {}  # username -> [EXPENSE_FIELDS 튜플, ...] (id 오름차순)
+        self._rollups = {}   # (username, month, category, type) -> [total, count]
+        self._wishlist = {}  # username -> (id, username, item_name, target_price, image_hash)
+        self._next_expense_id = 1
+        self._next_wishlist_id = 1
+
+    def migrate(self):
+        return []
+
+    # --- 사용자 ---
+    def get_user(self, username):
+        with self._lock:
+            user = self._users.get(username)
+            return (user['pin'], user['class_name']) if user else None
+
+    def create_user(self, username, pin, class_name=''):
+        with self._lock:
+            if username in self._users:
+                raise ValueError(f"이미 있는 닉네임: {username!r}")
+            self._users[username] = {'pin': pin, 'class_name': class_name, 'streak_days': 0,
+                                     'last_active_date': None, 'xp': 0, 'points': 0}
+
+    def set_user_class(self, username, class_name):
+        with self._lock:
+            if username in self._users:
+                self._users[username]['class_name'] = class_name
+
+    def get_user_stats(self, username):
+        with self._lock:
+            user = self._users.get(username)
+            return (user['streak_days'], user['xp'], user['points']) if user else (0, 0, 0)
+
+    def _apply_activity(self, username, xp_gain, points_gain, today):
+        user = self._users[username]
+        user['streak_days'] = next_streak(user['streak_days'], user['last_active_date'], today)
+        user['last_active_date'] = str(today)
+        user['xp'] += xp_gain
+        user['points'] += points_gain
+        return user['streak_days'], user['xp'], user['points']
+
+    def update_activity(self, username, xp_gain, points_gain, today):
+        with self._lock:
+            if username not in self._users:
+                raise UserNotFound(f"{username!r}은(는) 이 저장소에 없어요.")
+            return self._apply_activity(username, xp_gain, points_gain, today)
+
+    def usernames(self):
+        with self._lock:
+            return set(self._users)
+
+    def leaderboard_rows(self):
+        with self._lock:
+            return [(username, user['class_name'], user['xp'], user['points']) for username, user in self._users.items()]
+
+    # --- 소비 기록 ---
+    def add_expenses(self, rows, xp_per_row, points_per_row, today, per_row=True):
+        deltas, counts = group_expense_rows(rows)
+        with self._lock:
+            missing = [username for username in counts if username not in self._users]
+            if missing:
+                raise UserNotFound(f"{missing[0]!r}은(는) 이 저장소에 없어요.")
+            for username, date, item, price, category, type_val in rows:
+                self._expenses.setdefault(username, []).append(
+                    (self._next_expense_id, username, date, item, price, category, type_val))
+                self._next_expense_id += 1
+            for key, (total, count) in deltas.items():
+                rollup = self._rollups.setdefault(key, [0, 0])
+                rollup[0] += total
+                rollup[1] += count
+            return {username: self._apply_activity(username, xp_per_row * rewarded(n, per_row), points_per_row * rewarded(n, per_row), today)
+                    for username, n in counts.items()}
+
+    def _sorted_expenses(self, username):
+        # (date, id) 내림차순
+        return sorted(self._expenses.get(username, []), key=lambda row: (row[2], row[0]), reverse=True)
+
+    def all_expenses(self, username):
+        with self._lock:
+            return self._sorted_expenses(username)
+
+    def expense_page(self, username, after=None, limit=20, columns=EXPENSE_FIELDS):
+        with self._lock:
+            rows = self._sorted_expenses(username)
+        if after is not None:
+            after = (str(after[0]), int(after[1]))
+            rows = [row for row in rows if (row[2], row[0]) < after]
+        positions = [EXPENSE_FIELDS.index(name) for name in columns]
+        return [tuple(row[i] for i in positions) for row in rows[:limit]]
+
+    def expense_columns(self, username):
+        with self._lock:
+            rows = sorted(self._expenses.get(username, []), key=lambda row: (row[2], row[0]))
+        return code_expense_rows([(to_epoch_day(row[2]), row[4], row[5], row[6]) for row in rows])
+
+    def spending_summary(self, username, month=None):
+        summary = {}
+        with self._lock:
+            for (user, row_month, category, type_val), (total, count) in self._rollups.items():
+                if user == username and (not month or row_month == month):
+                    entry = summary.setdefault((category, type_val), [0, 0])
+                    entry[0] += total
+                    entry[1] += count
+        rows = [(category, type_val, total, count) for (category, type_val), (total, count) in summary.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    # --- 위시리스트 ---
+    def set_wishlist(self, username, item_name, target_price, image_hash):
+        with self._lock:
+            self._wishlist[username] = (self._next_wishlist_id, username, item_name, target_price, image_hash)
+            self._next_wishlist_id += 1
+
+    def get_wishlist(self, username):
+        with self._lock:
+            return self._wishlist.get(username)
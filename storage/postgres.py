@@ -0,0 +1,209 @@
+from datetime import timedelta
+
+from storage.base import EXPENSE_FIELDS, Storage, UserNotFound, code_expense_rows, group_expense_rows, rewarded
+
+# PostgreSQL 저장소 (교육청 서버처럼 여러 학교가 한 DB 서버를 함께 쓸 때).
+# 사용법: MONEY_MANAGER_STORAGE=postgresql://user:pw@host:5432/money_manager streamlit run streamlit_app.py
+# psycopg 3과 psycopg_pool이 필요하다. (pip install "psycopg[binary,pool]")
+# 동작 점검: python -m storage.conformance --url pgserver (도커로 띄우는 방법도 storage/conformance.py에 있다)
+# 연결은 psycopg_pool.ConnectionPool이 min_size~max_size개를 미리 열어 두고 빌려준다.
+# 서버 DB는 쓰기 잠금이 줄 단위라서 반별 DB 나누기(sharding.py)는 쓰지 않는다.
+# 날짜는 원래 4바이트 DATE로 저장되므로 SQLite처럼 epoch-day 컬럼으로 바꾸지 않았다.
+
+SCHEMA_VERSION = 1
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS users
+       (username TEXT PRIMARY KEY,
+        pin TEXT,
+        class_name TEXT NOT NULL DEFAULT '',
+        last_active_date DATE,
+        streak_days INTEGER NOT NULL DEFAULT 0,
+        xp INTEGER NOT NULL DEFAULT 0,
+        points INTEGER NOT NULL DEFAULT 0)''',
+    '''CREATE TABLE IF NOT EXISTS expenses
+       (id BIGSERIAL PRIMARY KEY,
+        username TEXT NOT NULL,
+        date DATE NOT NULL,
+        item TEXT,
+        price INTEGER NOT NULL,
+        category TEXT,
+        type TEXT)''',
+    'CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (username, date, id)',
+    '''CREATE TABLE IF NOT EXISTS expense_rollups
+       (username TEXT,
+        month TEXT,
+        category TEXT,
+        type TEXT,
+        total BIGINT NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (username, month, category, type))''',
+    '''CREATE TABLE IF NOT EXISTS wishlist
+       (id BIGSERIAL PRIMARY KEY,
+        username TEXT UNIQUE,
+        item_name TEXT,
+        target_price INTEGER,
+        image_hash TEXT)''',
+    'CREATE INDEX IF NOT EXISTS idx_users_class_points ON users (class_name, points DESC)',
+    'CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)',
+]
+
+ACTIVITY_UPDATE_SQL = '''UPDATE users SET
+        streak_days = CASE
+            WHEN last_active_date = %(today)s THEN streak_days
+            WHEN last_active_date = %(yesterday)s THEN streak_days + 1
+            ELSE 1
+        END,
+        last_active_date = %(today)s,
+        xp = xp + %(xp_gain)s,
+        points = points + %(points_gain)s
+    WHERE username = %(username)s
+    RETURNING streak_days, xp, points'''
+
+# 소비 기록의 열 -> SQL 식
+EXPENSE_COLUMN_SQL = {'id': 'id', 'username': 'username', 'date': "to_char(date, 'YYYY-MM-DD')", 'item': 'item',
+                      'price': 'price', 'category': 'category', 'type': 'type'}
+
+
+def expense_select(columns=EXPENSE_FIELDS):
+    return f"SELECT {', '.join(EXPENSE_COLUMN_SQL[name] for name in columns)} FROM expenses"
+
+
+EXPENSE_SELECT = expense_select()
+
+
+def _pool_class():
+    try:
+        from psycopg_pool import ConnectionPool
+    except ImportError:
+        raise RuntimeError('PostgreSQL 저장소를 쓰려면 psycopg와 psycopg_pool이 필요해요. (pip install "psycopg[binary,pool]")')
+    return ConnectionPool
+
+
+class PostgresStorage(Storage):
+
+    def __init__(self, dsn, min_size=2, max_size=10, timeout=5.0):
+        # timeout: 빈 연결이 없을 때 기다리는 최대 시간(초)
+        self.pool = _pool_class()(dsn, min_size=min_size, max_size=max_size, timeout=timeout, open=True)
+
+    def migrate(self):
+        with self.pool.connection() as conn:
+            with conn.transaction():
+                # 여러 앱 서버가 동시에 시작해도 한 곳에서만 스키마를 만들도록 잠금을 잡는다.
+                conn.execute('SELECT pg_advisory_xact_lock(20240601)')
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                row = conn.execute('SELECT version FROM schema_version').fetchone()
+                if row is None:
+                    conn.execute('INSERT INTO schema_version (version) VALUES (%s)', (SCHEMA_VERSION,))
+                    return [SCHEMA_VERSION]
+        return []
+
+    def close(self):
+        self.pool.close()
+
+    def _fetchone(self, query, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(query, params).fetchone()
+
+    def _fetchall(self, query, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def _execute(self, query, params=()):
+        # pool.connection() 블록이 예외 없이 끝나면 커밋된다.
+        with self.pool.connection() as conn:
+            conn.execute(query, params)
+
+    # --- 사용자 ---
+    def get_user(self, username):
+        row = self._fetchone('SELECT pin, class_name FROM users WHERE username = %s', (username,))
+        return tuple(row) if row else None
+
+    def create_user(self, username, pin, class_name=''):
+        self._execute('INSERT INTO users (username, pin, class_name) VALUES (%s, %s, %s)', (username, pin, class_name))
+
+    def set_user_class(self, username, class_name):
+        self._execute('UPDATE users SET class_name = %s WHERE username = %s', (class_name, username))
+
+    def get_user_stats(self, username):
+        row = self._fetchone('SELECT streak_days, xp, points FROM users WHERE username = %s', (username,))
+        return tuple(row) if row else (0, 0, 0)
+
+    def _apply_activity(self, conn, username, xp_gain, points_gain, today):
+        row = conn.execute(ACTIVITY_UPDATE_SQL, {
+            'today': today,
+            'yesterday': today - timedelta(days=1),
+            'xp_gain': xp_gain,
+            'points_gain': points_gain,
+            'username': username,
+        }).fetchone()
+        if row is None:
+            raise UserNotFound(f"{username!r}은(는) 이 DB에 없어요.")
+        return tuple(row)
+
+    def update_activity(self, username, xp_gain, points_gain, today):
+        with self.pool.connection() as conn:
+            return self._apply_activity(conn, username, xp_gain, points_gain, today)
+
+    def usernames(self):
+        return {row[0] for row in self._fetchall('SELECT username FROM users')}
+
+    def leaderboard_rows(self):
+        return self._fetchall('SELECT username, class_name, xp, points FROM users')
+
+    # --- 소비 기록 ---
+    def add_expenses(self, rows, xp_per_row, points_per_row, today, per_row=True):
+        deltas, counts = group_expense_rows(rows)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany('''INSERT INTO expenses (username, date, item, price, category, type)
+                                   VALUES (%s, %s, %s, %s, %s, %s)''', rows)
+                cur.executemany('''INSERT INTO expense_rollups (username, month, category, type, total, count)
+                                   VALUES (%s, %s, %s, %s, %s, %s)
+                                   ON CONFLICT (username, month, category, type)
+                                   DO UPDATE SET total = expense_rollups.total + excluded.total,
+                                                 count = expense_rollups.count + excluded.count''',
+                                [(*key, total, count) for key, (total, count) in deltas.items()])
+            return {username: self._apply_activity(conn, username, xp_per_row * rewarded(n, per_row), points_per_row * rewarded(n, per_row), today)
+                    for username, n in counts.items()}
+
+    def all_expenses(self, username):
+        return self._fetchall(EXPENSE_SELECT + ' WHERE username = %s ORDER BY date DESC', (username,))
+
+    def expense_page(self, username, after=None, limit=20, columns=EXPENSE_FIELDS):
+        query = expense_select(columns) + ' WHERE username = %s'
+        params = [username]
+        if after is not None:
+            query += ' AND (date, id) < (%s::date, %s)'
+            params.extend(after)
+        query += ' ORDER BY date DESC, id DESC LIMIT %s'
+        params.append(limit)
+        return self._fetchall(query, params)
+
+    def expense_columns(self, username):
+        return code_expense_rows(self._fetchall('''SELECT date - DATE '1970-01-01', price, category, type FROM expenses
+                                                   WHERE username = %s ORDER BY date, id''', (username,)))
+
+    def spending_summary(self, username, month=None):
+        query = '''SELECT category, type, SUM(total)::BIGINT AS total, SUM(count)::INTEGER AS count
+                   FROM expense_rollups WHERE username = %s'''
+        params = [username]
+        if month:
+            query += ' AND month = %s'
+            params.append(month)
+        query += ' GROUP BY category, type ORDER BY total DESC'
+        return self._fetchall(query, params)
+
+    # --- 위시리스트 ---
+    def set_wishlist(self, username, item_name, target_price, image_hash):
+        self._execute('''INSERT INTO wishlist (username, item_name, target_price, image_hash)
+                         VALUES (%s, %s, %s, %s)
+                         ON CONFLICT (username) DO UPDATE SET item_name = excluded.item_name,
+                             target_price = excluded.target_price, image_hash = excluded.image_hash''',
+                      (username, item_name, target_price, image_hash))
+
+    def get_wishlist(self, username):
+        row = self._fetchone('SELECT id, username, item_name, target_price, image_hash FROM wishlist WHERE username = %s',
+                             (username,))
+        return tuple(row) if row else None
@@ -0,0 +1,316 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+import profiling
+import rollups
+from migrations import migrate
+from storage.base import EXPENSE_FIELDS, Storage, UserNotFound, group_expense_rows, rewarded, to_epoch_day
+
+# SQLite 저장소 (기본).
+# DB 파일마다 연결 풀을 하나 두고, 스키마는 migrations.py로 관리한다.
+# expenses는 날짜를 epoch-day 정수(day)로, 종류/유형을 조회 표의 코드(category_id, type_id)로 저장한다.
+# 바꾸는 일은 이 파일에서만 하고, 밖으로는 'YYYY-MM-DD' 문자열과 이름을 그대로 주고받는다.
+
+
+# --- 커넥션 풀 ---
+class ConnectionPool:
+    # 한 프로세스 안에서 SQLite 연결을 빌려주고 돌려받는 풀이다.
+    # Streamlit의 스크립트 스레드가 번갈아 가며 같은 연결을 쓰기 때문에 check_same_thread를 끄고,
+    # 한 연결은 한 번에 한 스레드만 빌려 가도록 잠금으로 관리한다.
+
+    def __init__(self, path, max_idle=8, busy_timeout_ms=5000, mmap_size=64 * 1024 * 1024):
+        self.path = path
+        self.max_idle = max_idle
+        self.busy_timeout_ms = busy_timeout_ms
+        self.mmap_size = mmap_size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        # WAL 모드: 읽기와 쓰기가 서로를 막지 않아 여러 학생이 동시에 써도 덜 기다린다.
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        return conn
+
+    def _check_pid(self):
+        # fork된 자식 프로세스는 부모의 연결을 그대로 쓰면 안 되므로 버리고 새로 연다.
+        if self._pid != os.getpid():
+            self._idle = []
+            self._pid = os.getpid()
+
+    def acquire(self):
+        with self._lock:
+            self._check_pid()
+            if self._idle:
+                self.reused += 1
+                conn = self._idle.pop()
+            else:
+                self.opened += 1
+                conn = None
+        if conn is None:
+            conn = self._open()
+        # 계측 중인 재실행에서만 SQL 문장 수를 센다. (꺼져 있으면 콜백을 떼어 비용이 없다)
+        conn.set_trace_callback(profiling.on_sql if profiling.current() else None)
+        return conn
+
+    def release(self, conn):
+        # 끝나지 않은 트랜잭션이 다음 사용자에게 넘어가지 않도록 정리한 뒤 돌려놓는다.
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            self.closed += 1
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'opened': self.opened,
+                'reused': self.reused,
+                'closed': self.closed,
+                'idle': len(self._idle),
+            }
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.closed += len(idle)
+        for conn in idle:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path):
+    # DB 파일 경로마다 하나의 풀을 만들어 프로세스 전체에서 공유한다.
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+# 보상 지급과 스트릭 계산을 UPDATE 한 문장으로 처리한다.
+# SET 오른쪽의 컬럼 값은 모두 '바뀌기 전' 값이라서, 읽고-계산하고-쓰는 사이에 다른 탭의 XP가 사라지는 일이 없다.
+ACTIVITY_UPDATE_SQL = '''UPDATE users SET
+        streak_days = CASE
+            WHEN last_active_date = :today THEN COALESCE(streak_days, 0)  -- 오늘 이미 기록함
+            WHEN last_active_date = :yesterday THEN COALESCE(streak_days, 0) + 1  -- 연속 기록
+            ELSE 1  -- 첫 기록이거나 끊김, 다시 시작
+        END,
+        last_active_date = :today,
+        xp = COALESCE(xp, 0) + :xp_gain,
+        points = COALESCE(points, 0) + :points_gain
+    WHERE username = :username
+    RETURNING streak_days, xp, points'''
+
+
+# 소비 기록의 열 -> SQL 식. 코드는 조회 표와 이어서 이름으로, day는 날짜 문자열로 되돌린다.
+EXPENSE_COLUMN_SQL = {
+    'id': 'e.id',
+    'username': 'e.username',
+    'date': "date(e.day * 86400, 'unixepoch')",
+    'item': 'e.item',
+    'price': 'e.price',
+    'category': 'cat.label',
+    'type': 'typ.label',
+}
+
+
+def expense_select(columns=EXPENSE_FIELDS):
+    # columns 순서로 읽는 SELECT. 조회 표는 그 열이 있을 때만 잇는다.
+    query = f"SELECT {', '.join(EXPENSE_COLUMN_SQL[name] for name in columns)} FROM expenses e"
+    if 'category' in columns:
+        query += ' LEFT JOIN expense_categories cat ON cat.id = e.category_id'
+    if 'type' in columns:
+        query += ' LEFT JOIN expense_types typ ON typ.id = e.type_id'
+    return query
+
+
+EXPENSE_SELECT = expense_select()
+
+LOOKUP_TABLES = {'category': 'expense_categories', 'type': 'expense_types'}
+
+
+def apply_activity(c, username, xp_gain, points_gain, today):
+    # 열려 있는 트랜잭션 안에서 보상을 지급하고 새 (스트릭, XP, 포인트)를 돌려준다.
+    # 사용자가 없으면 UserNotFound (호출한 쪽의 트랜잭션은 연결을 돌려줄 때 취소된다)
+    c.execute(ACTIVITY_UPDATE_SQL, {
+        'today': str(today),
+        'yesterday': str(today - timedelta(days=1)),
+        'xp_gain': xp_gain,
+        'points_gain': points_gain,
+        'username': username,
+    })
+    row = c.fetchone()
+    if row is None:
+        raise UserNotFound(f"{username!r}은(는) 이 DB에 없어요.")
+    return tuple(row)
+
+
+class SQLiteStorage(Storage):
+
+    def __init__(self, path):
+        self.path = path
+        self.pool = get_pool(path)
+        # 조회 표 이름 -> {이름: 코드}. 코드는 한 번 정해지면 바뀌지 않으므로 프로세스 동안 기억해 둔다.
+        self._codes = {table: {} for table in LOOKUP_TABLES.values()}
+
+    def connection(self):
+        return self.pool.connection()
+
+    def migrate(self):
+        with self.connection() as conn:
+            return migrate(conn)
+
+    def close(self):
+        self.pool.close_all()
+
+    # --- 사용자 ---
+    def get_user(self, username):
+        with self.connection() as conn:
+            row = conn.execute('SELECT pin, class_name FROM users WHERE username = ?', (username,)).fetchone()
+        return tuple(row) if row else None
+
+    def create_user(self, username, pin, class_name=''):
+        with self.connection() as conn:
+            conn.execute('INSERT INTO users (username, pin, class_name) VALUES (?, ?, ?)', (username, pin, class_name))
+            conn.commit()
+
+    def set_user_class(self, username, class_name):
+        with self.connection() as conn:
+            conn.execute('UPDATE users SET class_name = ? WHERE username = ?', (class_name, username))
+            conn.commit()
+
+    def get_user_stats(self, username):
+        with self.connection() as conn:
+            row = conn.execute('SELECT streak_days, xp, points FROM users WHERE username = ?', (username,)).fetchone()
+        return tuple(row) if row else (0, 0, 0)
+
+    def update_activity(self, username, xp_gain, points_gain, today):
+        with self.connection() as conn:
+            stats = apply_activity(conn.cursor(), username, xp_gain, points_gain, today)
+            conn.commit()
+        return stats
+
+    def usernames(self):
+        with self.connection() as conn:
+            return {row[0] for row in conn.execute('SELECT username FROM users')}
+
+    def leaderboard_rows(self):
+        with self.connection() as conn:
+            return conn.execute('SELECT username, class_name, xp, points FROM users').fetchall()
+
+    # --- 소비 기록 ---
+    def _lookup_codes(self, conn, table, labels):
+        # 이름들의 코드를 돌려준다. 처음 보는 이름은 조회 표에 추가해 바로 커밋한 뒤에만 기억한다.
+        # (기록 저장이 취소되어도 코드는 남으므로, 기억해 둔 코드가 다른 이름에 다시 쓰이는 일이 없다)
+        codes = self._codes[table]
+        missing = {label for label in labels if label is not None and label not in codes}
+        if missing:
+            conn.executemany(f'INSERT OR IGNORE INTO {table} (label) VALUES (?)', [(label,) for label in missing])
+            conn.commit()
+            codes.update((label, code) for code, label in conn.execute(f'SELECT id, label FROM {table}'))
+        return codes
+
+    def add_expenses(self, rows, xp_per_row, points_per_row, today, per_row=True):
+        # 기록은 executemany로 한 번에 넣고, 월간 요약과 보상은 사용자별로 모아서 한 번씩만 고친다.
+        deltas, counts = group_expense_rows(rows)
+        with self.connection() as conn:
+            categories = self._lookup_codes(conn, LOOKUP_TABLES['category'], {row[4] for row in rows})
+            types = self._lookup_codes(conn, LOOKUP_TABLES['type'], {row[5] for row in rows})
+            c = conn.cursor()
+            c.executemany('INSERT INTO expenses (username, day, item, price, category_id, type_id) VALUES (?, ?, ?, ?, ?, ?)',
+                          [(username, to_epoch_day(day), item, price, categories.get(category), types.get(type_val))
+                           for username, day, item, price, category, type_val in rows])
+            for (username, month, category, type_val), (total, count) in deltas.items():
+                rollups.apply_delta(c, username, month, category, type_val, total, count)
+            stats = {username: apply_activity(c, username, xp_per_row * rewarded(n, per_row), points_per_row * rewarded(n, per_row), today)
+                     for username, n in counts.items()}
+            conn.commit()
+        return stats
+
+    def all_expenses(self, username):
+        with self.connection() as conn:
+            return conn.execute(EXPENSE_SELECT + ' WHERE e.username = ? ORDER BY e.day DESC', (username,)).fetchall()
+
+    def expense_page(self, username, after=None, limit=20, columns=EXPENSE_FIELDS):
+        # OFFSET 대신 (date, id) 위치부터 이어 읽으므로 기록이 수만 건이어도 인덱스에서 limit줄만 읽는다.
+        query = expense_select(columns) + ' WHERE e.username = ?'
+        params = [username]
+        if after is not None:
+            query += ' AND (e.day, e.id) < (?, ?)'
+            params.extend((to_epoch_day(after[0]), int(after[1])))
+        query += ' ORDER BY e.day DESC, e.id DESC LIMIT ?'
+        params.append(limit)
+        with self.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def expense_columns(self, username):
+        # 코드를 그대로 넘기므로 조회 표와 잇지 않고 인덱스 순서대로 읽는다.
+        with self.connection() as conn:
+            rows = conn.execute('''SELECT day, COALESCE(price, 0), COALESCE(category_id, 0), COALESCE(type_id, 0)
+                                   FROM expenses WHERE username = ? AND day IS NOT NULL
+                                   ORDER BY day, id''', (username,)).fetchall()
+            labels = []
+            for table in (LOOKUP_TABLES['category'], LOOKUP_TABLES['type']):
+                codes = dict(conn.execute(f'SELECT id, label FROM {table}').fetchall())
+                labels.append([codes.get(code) for code in range(max(codes, default=0) + 1)])
+        return rows, labels[0], labels[1]
+
+    def archived_parts(self, username):
+        with self.connection() as conn:
+            return conn.execute('''SELECT month, path FROM expense_archive
+                                   WHERE username = ? ORDER BY month DESC, path''', (username,)).fetchall()
+
+    def spending_summary(self, username, month=None):
+        query = '''SELECT category, type, SUM(total) AS total, SUM(count) AS count
+                   FROM expense_rollups WHERE username = ?'''
+        params = [username]
+        if month:
+            query += ' AND month = ?'
+            params.append(month)
+        query += ' GROUP BY category, type ORDER BY total DESC'
+        with self.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    # --- 위시리스트 ---
+    def set_wishlist(self, username, item_name, target_price, image_hash):
+        with self.connection() as conn:
+            c = conn.cursor()
+            # 목표는 하나만 설정 가능하도록 기존 목표 삭제 (심플 버전)
+            c.execute('DELETE FROM wishlist WHERE username = ?', (username,))
+            c.execute('INSERT INTO wishlist (username, item_name, target_price, image_hash) VALUES (?, ?, ?, ?)',
+                      (username, item_name, target_price, image_hash))
+            conn.commit()
+
+    def get_wishlist(self, username):
+        with self.connection() as conn:
+            row = conn.execute('''SELECT id, username, item_name, target_price, image_hash
+                                  FROM wishlist WHERE username = ?''', (username,)).fetchone()
+        return tuple(row) if row else None
@@ -1,171 +1,36 @@
+import time
+_script_started = time.perf_counter() # 첫 화면까지 걸린 시간을 재기 위한 기준 (profiling.startup_mark)
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import sqlite3
 from datetime import datetime, timedelta
 import calendar
 import random
+import json
+
+# 데이터베이스 함수는 database.py에 모아두고, 연결은 프로세스 단위 풀에서 재사용한다.
+from database import (init_db, login_user, get_user_stats, get_leaderboard, get_my_rank, get_user_class,
+                      get_expense_page, add_wishlist_db, get_wishlist_db,
+                      get_expense_columns, get_spending_summary, pool_stats,
+                      EXPENSE_CATEGORIES, EXPENSE_TYPES)
+from cache import cache_stats
+from image_store import thumbnail_path
+from importer import import_expenses
+from calendar_view import month_calendar_html
+from write_queue import submit_expense, wait_for_user, write_queue_stats
+import profiling
+# pandas, Plotly(charts.py), NumPy(coach.py, expense_columns.py)는 불러오는 데 오래 걸리므로 맨 위에서 import하지 않고
+# 그 라이브러리가 필요한 화면을 그릴 때 불러온다. (로그인 화면은 하나도 쓰지 않는다)
+profiling.startup_mark("imports", _script_started)
+
+# 계측 시작 (관리자가 켠 세션 또는 MONEY_MANAGER_PROFILE=1 일 때만 기록한다)
+profiling.start_run(
+    profiling.is_admin(st.session_state.get("username", "")) and st.session_state.get("profiling_on", False),
+    label=st.session_state.get("section", ""),
+)
 
-# --- 데이터베이스 함수 정의 ---
-def init_db():
-    #앱 실행 시 필요한 데이터베이스와 테이블(사용자, 소비 기록, 위시리스트)을 자동으로 생성한다. 
-    #'money_manager.db' 파일이 생성되고, 사용자가 입력한 데이터를 영구적으로 저장할 공간이 생긴다.
-    
-    conn = sqlite3.connect('money_manager.db')
-    c = conn.cursor()
-    # 사용자 테이블 (닉네임, 비밀번호)
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (username TEXT PRIMARY KEY, pin TEXT)''')
-    # 소비 기록 테이블
-    c.execute('''CREATE TABLE IF NOT EXISTS expenses
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                  username TEXT, 
-                  date TEXT, 
-                  item TEXT, 
-                  price INTEGER, 
-                  category TEXT, 
-                  type TEXT)''')
-    # 위시리스트 테이블
-    c.execute('''CREATE TABLE IF NOT EXISTS wishlist
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                  username TEXT, 
-                  item_name TEXT, 
-                  target_price INTEGER, 
-                  image_data BLOB)''')
-    
-    # 게이미피케이션을 위한 컬럼 추가 (기존 DB 호환성 유지)
-    # 게이미피케이션(XP, 포인트, 스트릭) 기능을 위해 기존 DB 구조를 업데이트한다.
-    # 기존에 앱을 쓰던 사용자도 데이터 손실 없이 새로운 게임 요소(레벨업 등)를 즐길 수 있도록 한다.
-    try:
-        c.execute("ALTER TABLE users ADD COLUMN last_active_date TEXT")
-    except sqlite3.OperationalError: pass
-    
-    try:
-        c.execute("ALTER TABLE users ADD COLUMN streak_days INTEGER DEFAULT 0")
-    except sqlite3.OperationalError: pass
-    
-    try:
-        c.execute("ALTER TABLE users ADD COLUMN xp INTEGER DEFAULT 0")
-    except sqlite3.OperationalError: pass
-    
-    try:
-        c.execute("ALTER TABLE users ADD COLUMN points INTEGER DEFAULT 0")
-    except sqlite3.OperationalError: pass
-
-    conn.commit()
-    conn.close()
-
-def login_user(username, pin):
-    #로그인 및 자동 회원가입 로직을 처리한다. 
-    #DB에 없는 닉네임이면 자동으로 가입시켜 초등학생들이 복잡한 절차 없이 바로 앱을 사용할 수 있게 한다.
-    conn = sqlite3.connect('money_manager.db')
-    c = conn.cursor()
-    c.execute('SELECT pin FROM users WHERE username = ?', (username,))
-    result = c.fetchone()
-    conn.close()
-    if result:
-        return (True, "로그인 성공! 어서와요!") if result[0] == pin else (False, "비밀번호가 틀렸어요. 다시 확인해볼까요?")
-    else:
-        # 신규 유저 자동 가입
-        conn = sqlite3.connect('money_manager.db')
-        c = conn.cursor()
-        c.execute('INSERT INTO users (username, pin) VALUES (?, ?)', (username, pin))
-        conn.commit()
-        conn.close()
-        return True, "새로운 친구 환영해요! 가입이 완료되었어요!"
-
-def update_user_activity(username, xp_gain=10, points_gain=10):
-    #사용자가 소비를 기록할 때마다 보상(XP, 포인트)을 지급하고 연속 접속일(Streak)을 계산한다.
-    #'정의적 비계'로서 학생들에게 지속적인 학습 동기를 부여한다.
-    """활동 기록 시 스트릭, 경험치, 포인트 업데이트"""
-    conn = sqlite3.connect('money_manager.db')
-    c = conn.cursor()
-    
-    # 현재 유저 정보 조회
-    c.execute('SELECT last_active_date, streak_days, xp, points FROM users WHERE username = ?', (username,))
-    row = c.fetchone()
-    
-    if row:
-        last_date_str, streak, xp, points = row
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        
-        # 경험치 및 포인트 증가
-        new_xp = (xp if xp else 0) + xp_gain
-        new_points = (points if points else 0) + points_gain
-        
-        # 스트릭 계산
-        new_streak = streak if streak else 0
-        if last_date_str != today_str:
-            if last_date_str:
-                last_date = datetime.strptime(last_date_str, "%Y-%m-%d")
-                if (datetime.now() - last_date).days == 1:
-                    new_streak += 1 # 연속 기록
-                else:
-                    new_streak = 1 # 끊김, 다시 시작
-            else:
-                new_streak = 1 # 첫 기록
-        
-        c.execute('UPDATE users SET last_active_date = ?, streak_days = ?, xp = ?, points = ? WHERE username = ?', 
-                  (today_str, new_streak, new_xp, new_points, username))
-    
-    conn.commit()
-    conn.close()
-
-def get_user_stats(username):
-    #사용자의 현재 레벨과 랭킹 정보를 표시하기 위해 DB에서 데이터를 조회한다.
-    conn = sqlite3.connect('money_manager.db')
-    c = conn.cursor()
-    c.execute('SELECT streak_days, xp, points FROM users WHERE username = ?', (username,))
-    result = c.fetchone()
-    conn.close()
-    return result if result else (0, 0, 0)
-
-def get_leaderboard():
-    #사회적 모델링를 통해 포인트가 높은 상위 5명의 친구 목록을 가져온다.
-    conn = sqlite3.connect('money_manager.db')
-    # 포인트 순으로 상위 5명 조회
-    df = pd.read_sql_query("SELECT username, xp, points FROM users ORDER BY points DESC LIMIT 5", conn)
-    conn.close()
-    return df
-
-def add_expense_db(username, date, item, price, category, type_val):
-    #소비 내역(날짜, 항목, 금액, Need/Want 여부)을 DB에 저장하고 보상을 지급한다.
-    conn = sqlite3.connect('money_manager.db')
-    c = conn.cursor()
-    c.execute('INSERT INTO expenses (username, date, item, price, category, type) VALUES (?, ?, ?, ?, ?, ?)',
-              (username, str(date), item, price, category, type_val))
-    conn.commit()
-    conn.close()
-    update_user_activity(username, xp_gain=10, points_gain=10) # 활동 업데이트
-
-def get_expenses_db(username):
-    # 사용자의 모든 소비 기록을 최신순으로 가져와 시각화(Tab 1) 및 AI 분석(Tab 2)에 사용한다.
-    conn = sqlite3.connect('money_manager.db')
-    df = pd.read_sql_query("SELECT * FROM expenses WHERE username = ? ORDER BY date DESC", conn, params=(username,))
-    conn.close()
-    return df
-
-def add_wishlist_db(username, item_name, target_price, image_data):
-    # '내 꿈 저금통(Tab 4)'에 목표 물건을 저장한다. (단순화를 위해 기존 목표 덮어쓰기를 한다.)
-    conn = sqlite3.connect('money_manager.db')
-    c = conn.cursor()
-    # 목표는 하나만 설정 가능하도록 기존 목표 삭제 (심플 버전)
-    c.execute('DELETE FROM wishlist WHERE username = ?', (username,))
-    c.execute('INSERT INTO wishlist (username, item_name, target_price, image_data) VALUES (?, ?, ?, ?)',
-              (username, item_name, target_price, image_data))
-    conn.commit()
-    conn.close()
-
-def get_wishlist_db(username):
-    conn = sqlite3.connect('money_manager.db')
-    c = conn.cursor()
-    c.execute('SELECT * FROM wishlist WHERE username = ?', (username,))
-    result = c.fetchone()
-    conn.close()
-    return result
-
-# 앱 시작 시 DB 초기화
-init_db()
+# 앱 시작 시 DB 초기화 (서버 프로세스에서 처음 한 번만 실제로 준비하고, 재실행 때는 바로 넘어간다)
+with profiling.span("init_db"):
+    init_db()
 
 # 페이지 기본 설정
 # 브라우저 탭 이름과 아이콘을 설정하고, 레이아웃을 넓게(wide) 사용하여 시각화 효과를 높인다.
@@ -175,112 +40,35 @@ st.set_page_config(
     layout="wide"
 )
 
+# --- 화면 조각(fragment) ---
+# 조각 안의 위젯을 누르면 스크립트 전체가 아니라 그 조각만 다시 실행된다.
+# 소비 기록처럼 여러 조각에 영향을 주는 동작은 콜백에서 st.rerun([조각 key, ...])으로 다시 그릴 조각을 직접 고른다.
+#   theme         사이드바 테마 색 (색을 바꾸면 이 조각만)
+#   growth_panel  사이드바 캐릭터/XP/포인트
+#   expense_form  소비 기록 입력 폼
+#   charts        차트와 지출 내역 표 (페이지 넘기기는 이 조각만)
+#   calendar      월간 캘린더 리포트 (연/월을 바꾸면 이 조각만)
+#   balance_game  소비 밸런스 게임 (선택과 다시 풀기는 이 조각만)
+
+# --- 커스텀 CSS 및 폰트 설정 (동적 테마 적용) ---
+# 스타일은 static/ 폴더에서 내보내는 파일이라 브라우저가 한 번 받아 캐시한다. (.streamlit/config.toml)
+# Jua 폰트도 static/fonts/ 에서 직접 내보낸다. (구글 폰트 서버를 쓰지 않는다)
+# 재실행마다 보내는 것은 스타일 파일 링크와 테마 색 변수 한 줄뿐이다.
+st.markdown('<link rel="stylesheet" href="app/static/money_manager.css">', unsafe_allow_html=True)
+
 # --- 사이드바: 테마 설정 ---
 # 딱딱한 기본 UI 대신, 학생들에게 친숙한 'Jua' 폰트와 둥근 모서리 디자인을 적용한다.
 # 사용자가 선택한 테마 색상이 버튼과 입력창에 실시간으로 반영되어 앱에 애착을 갖게 한다. 
-with st.sidebar:
+@st.fragment(key="theme")
+def theme_picker():
     st.header("🎨 디자인 설정")
     st.write("나만의 테마 색깔을 골라보세요!")
     theme_color = st.color_picker("메인 테마 색상", "#FFC0CB") # 기본값: 파스텔 핑크
+    # CSS 변수는 문서 전체에 적용되므로 사이드바에 두어도 모든 화면의 색이 바뀐다.
+    st.markdown(f"<style>:root {{ --mm-theme: {theme_color}; }}</style>", unsafe_allow_html=True)
 
-# --- 커스텀 CSS 및 폰트 설정 (동적 테마 적용) ---
-st.markdown(f"""
-    <style>
-    /* 구글 폰트 'Jua' 불러오기 */
-    @import url('https://fonts.googleapis.com/css2?family=Jua&display=swap');
-
-    /* 전체 폰트 적용 */
-    html, body, [class*="css"] {{
-        font-family: 'Jua', sans-serif;
-    }}
-
-    /* 배경색: 따뜻한 크림색 */
-    .stApp {{
-        background-color: #F8F0FC; /* 파스텔 퍼플 배경 */
-    }}
-
-    /* 버튼 디자인: 둥글고 입체적인 사탕 느낌 */
-    .stButton > button {{
-        background-color: {theme_color};
-        color: white;
-        border-radius: 25px;
-        border: none;
-        padding: 10px 24px;
-        font-size: 18px;
-        box-shadow: 0 4px 0 rgba(0,0,0,0.1);
-        transition: all 0.2s;
-    }}
-    .stButton > button:hover {{
-        filter: brightness(90%);
-        transform: scale(1.05); /* 살짝 커짐 */
-        color: white;
-    }}
-    .stButton > button:active {{
-        box-shadow: none;
-        transform: translateY(4px); /* 눌리는 효과 */
-    }}
-
-    /* 입력창 둥글게 */
-    .stTextInput > div > div > input, .stNumberInput > div > div > input {{
-        border-radius: 15px;
-        border: 2px solid {theme_color};
-    }}
-    
-    /* 탭 디자인 */
-    .stTabs [data-baseweb="tab-list"] {{
-        gap: 10px;
-    }}
-    .stTabs [data-baseweb="tab"] {{
-        height: 50px;
-        white-space: pre-wrap;
-        background-color: #E1F5FE;
-        border-radius: 15px 15px 0 0;
-        gap: 1px;
-        padding-top: 10px;
-        padding-bottom: 10px;
-    }}
-    .stTabs [aria-selected="true"] {{
-        background-color: {theme_color};
-        color: white !important;
-        font-weight: bold;
-    }}
-
-    /* 말풍선 스타일 정의 */
-    .chat-container {{
-        display: flex;
-        align-items: flex-start;
-        margin-bottom: 15px;
-    }}
-    .ai-bubble {{
-        background-color: {theme_color};
-        color: #333333;
-        padding: 15px;
-        border-radius: 0 20px 20px 20px;
-        box-shadow: 2px 2px 5px rgba(0,0,0,0.1);
-        margin-left: 10px;
-        font-size: 18px;
-    }}
-
-    /* 랭킹 카드 스타일 */
-    .rank-card {{
-        background-color: white;
-        border-radius: 20px;
-        padding: 15px;
-        margin-bottom: 10px;
-        box-shadow: 0 4px 10px rgba(0,0,0,0.05);
-        display: flex;
-        align-items: center;
-        border: 2px solid #E6E6FA;
-    }}
-    .rank-num {{
-        font-size: 24px;
-        font-weight: bold;
-        margin-right: 15px;
-        width: 40px;
-        text-align: center;
-    }}
-    </style>
-""", unsafe_allow_html=True)
+with st.sidebar:
+    theme_picker()
 
 # --- 로그인 화면 로직 ---
 if "logged_in" not in st.session_state:
@@ -295,11 +83,12 @@ if not st.session_state.logged_in:
     with st.form("login_form"):
         username = st.text_input("닉네임 (이름)", placeholder="예: 짱구")
         pin = st.text_input("비밀번호 (숫자 4자리)", type="password", max_chars=4, placeholder="예: 1234")
+        class_name = st.text_input("우리 반 (선택)", placeholder="예: 5-2")
         submit_login = st.form_submit_button("시작하기 🚀")
         
         if submit_login:
             if username and len(pin) == 4:
-                success, msg = login_user(username, pin)
+                success, msg = login_user(username, pin, class_name)
                 if success:
                     st.session_state.logged_in = True
                     st.session_state.username = username
@@ -309,6 +98,7 @@ if not st.session_state.logged_in:
                     st.error(msg)
             else:
                 st.warning("닉네임과 4자리 비밀번호를 정확히 입력해주세요!")
+    profiling.startup_mark("login_form", _script_started)
     st.stop() # 로그인 전에는 아래 내용 숨김
 
 # 앱 제목 및 소개
@@ -316,29 +106,24 @@ st.title("💰 머니 매니저 (Money Manager)")
 st.markdown(f"### 🛒 **{st.session_state.username}** 친구의 똑똑한 용돈 관리")
 
 # --- 게이미피케이션 정보 (사이드바/상단) ---
+# 소비 기록은 쓰기 대기열(write_queue.py)이 백그라운드에서 저장한다.
+# 내가 보낸 기록이 아직 저장 중이면 (보통 수 ms) 끝날 때까지 기다렸다가 읽어서, 방금 쓴 기록이 항상 보이게 한다.
+wait_for_user(st.session_state.username)
 streak_days, user_xp, user_points = get_user_stats(st.session_state.username)
 user_level = (user_xp // 100) + 1 # 100XP 마다 레벨업
-next_level_xp = 100 - (user_xp % 100)
-
-# 1. 내 캐릭터 키우기 (성장 시스템)
-# 사용자의 레벨(XP)에 따라 캐릭터가 알->병아리->닭으로 진화하는 모습을 보여준다.
-# '키우기 게임' 요소를 통해 학생들이 앱을 지속적으로 사용하도록 동기를 부여한다.
-if user_level < 3:
-    char_icon = "🥚"
-    level_title = "아직은 알"
-    char_desc = "세상에 나올 준비 중이에요!"
-elif user_level < 7:
-    char_icon = ""
-    level_title = "귀여운 병아리"
-    char_desc = "삐약삐약! 이제 막 돈 관리를 시작했어요!"
-elif user_level < 10:
-    char_icon = "🐓"
-    level_title = "씩씩한 닭"
-    char_desc = "꼬끼오! 스스로 용돈을 관리할 수 있어요!"
-else:
-    char_icon = "👑"
-    level_title = "황금 닭"
-    char_desc = "대단해요! 당신은 용돈 관리의 마스터!"
+
+def character_for_level(level):
+    # 1. 내 캐릭터 키우기 (성장 시스템)
+    # 사용자의 레벨(XP)에 따라 캐릭터가 알->병아리->닭으로 진화하는 모습을 보여준다.
+    # '키우기 게임' 요소를 통해 학생들이 앱을 지속적으로 사용하도록 동기를 부여한다.
+    if level < 3:
+        return "🥚", "아직은 알", "세상에 나올 준비 중이에요!"
+    elif level < 7:
+        return "", "귀여운 병아리", "삐약삐약! 이제 막 돈 관리를 시작했어요!"
+    elif level < 10:
+        return "🐓", "씩씩한 닭", "꼬끼오! 스스로 용돈을 관리할 수 있어요!"
+    else:
+        return "👑", "황금 닭", "대단해요! 당신은 용돈 관리의 마스터!"
 
 col_info, col_logout = st.columns([4, 1])
 with col_info:
@@ -349,93 +134,165 @@ with col_logout:
         st.rerun()
 
 # 사이드바: 캐릭터 및 성장 정보 표시
-with st.sidebar:
+# 자리만 먼저 잡아 두고, 화면을 다 그린 뒤(파일 맨 끝) 채운다. 이 화면에서 불러오기 등으로 쓴 기록도 반영된다.
+# 소비를 기록하면 이 조각만 다시 그린다. 쓰기 함수가 새 통계를 캐시에 넣어 두므로 DB를 다시 조회하지 않는다.
+growth_slot = st.sidebar.container()
+
+@st.fragment(key="growth_panel")
+def growth_panel():
+    # 조각만 다시 실행될 때는 위쪽의 wait_for_user()가 돌지 않으므로, 방금 보낸 기록이 저장될 때까지 여기서 기다린다.
+    wait_for_user(st.session_state.username)
+    _, xp, points = get_user_stats(st.session_state.username)
+    level = (xp // 100) + 1
+    next_level_xp = 100 - (xp % 100)
+    char_icon, level_title, char_desc = character_for_level(level)
     st.divider()
     st.markdown(f"<div style='text-align:center; font-size: 80px;'>{char_icon}</div>", unsafe_allow_html=True)
-    st.markdown(f"<h3 style='text-align:center;'>Lv.{user_level} {level_title}</h3>", unsafe_allow_html=True)
+    st.markdown(f"<h3 style='text-align:center;'>Lv.{level} {level_title}</h3>", unsafe_allow_html=True)
     st.markdown(f"<p style='text-align:center; color:gray;'>{char_desc}</p>", unsafe_allow_html=True)
     
     st.write("---")
-    st.write(f"**✨ 경험치 (XP):** {user_xp}")
+    st.write(f"**✨ 경험치 (XP):** {xp}")
     # 예쁜 프로그레스 바
     st.markdown(f"""
     <div style="background-color: #E0E0E0; border-radius: 10px; height: 15px; width: 100%;">
-        <div style="background-color: #FFC0CB; width: {(user_xp % 100)}%; height: 100%; border-radius: 10px;"></div>
+        <div style="background-color: #FFC0CB; width: {(xp % 100)}%; height: 100%; border-radius: 10px;"></div>
     </div>
     <p style="text-align: right; font-size: 12px; color: gray;">다음 레벨까지 {next_level_xp} XP</p>
     """, unsafe_allow_html=True)
     
-    st.write(f"**💰 절약 포인트:** {user_points} P")
+    st.write(f"**💰 절약 포인트:** {points} P")
+
+# 관리자용 성능 계측 패널 (환경변수 MONEY_MANAGER_ADMINS에 적힌 닉네임에게만 보인다)
+# 결과는 화면을 다 그린 뒤 파일 맨 끝에서 채운다.
+profile_panel = None
+if profiling.is_admin(st.session_state.username):
+    with st.sidebar:
+        with st.expander("🔧 성능 계측 (관리자)"):
+            st.checkbox("이 화면 계측하기", key="profiling_on")
+            profile_panel = st.empty()
+
+# 지출 내역 표에 한 번에 보여줄 줄 수
+HISTORY_PAGE_SIZE = 20
 
 # 탭 구성
 # [목적] 6가지 핵심 활동(기록, 분석, 게임, 목표, 보상, 랭킹)을 탭으로 분리하여 학습 흐름을 체계화한다.
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📊 마이 데이터 보드", "🤖 AI 머니 코치", "⚖️ 소비 밸런스 게임", "🎋 내 꿈 저금통", "🏆 나의 트로피", "👑 랭킹"])
+# st.tabs는 보이지 않는 탭의 코드(DB 조회, 차트, 달력)까지 매번 모두 실행하므로,
+# 메뉴에서 고른 화면 하나만 그린다. 각 화면은 아래 render_* 함수에 있고, 파일 맨 끝에서 호출한다.
+SECTIONS = ["📊 마이 데이터 보드", "🤖 AI 머니 코치", "⚖️ 소비 밸런스 게임", "🎋 내 꿈 저금통", "🏆 나의 트로피", "👑 랭킹"]
+section = st.radio("메뉴", SECTIONS, horizontal=True, key="section", label_visibility="collapsed")
 
 # --- Tab 1: 마이 데이터 보드 ---
-with tab1:
-    st.subheader("📝 용돈기입장")
-    
+# 소비 기록 한 건이 바꾸는 조각. 기록을 저장하면 이 조각들만 다시 그린다.
+EXPENSE_DEPENDENTS = ["expense_form", "charts", "calendar", "growth_panel"]
+
+def on_expense_submit():
+    # 입력 폼 제출 콜백. 기록을 쓰기 대기열에 넣고 바로 '기록 완료'를 보여준 뒤 새 기록이 바꾸는 조각만 다시 실행한다.
+    # (다른 화면과 사이드바 위쪽, 그 DB 조회는 다시 실행하지 않는다)
+    # 저장을 기다리지 않는다. 다시 그리는 조각들이 읽기 전에 wait_for_user()로 기다리고,
+    # 저장에 실패하면 입력 폼이 다음에 그려질 때 알린다. (expense_write_errors)
+    state = st.session_state
+    item, price = state.expense_item, state.expense_price
+    if not (item and price > 0):
+        state.expense_messages = [("error", "앗! 내용과 금액을 정확히 알려주세요. 🥺")]
+        st.rerun("expense_form")
+    ticket = submit_expense(state.username, state.expense_date, item, price, state.expense_category, state.expense_type)
+    state.expense_tickets = [*state.get("expense_tickets", []), (item, ticket)]
+    state.history_cursors = [None] # 새 기록이 보이도록 첫 페이지로
+    state.expense_messages = [("success", f"💸 '{item}' 소비 기록 완료! 경험치 +10, 포인트 +10 획득! ✨")]
+    st.rerun(EXPENSE_DEPENDENTS)
+
+def expense_write_errors():
+    # 저장이 끝난 기록 중 실패한 것의 오류 메시지. 아직 저장 중인 기록은 다음 실행에서 다시 확인한다.
+    pending, messages = [], []
+    for item, ticket in st.session_state.get("expense_tickets", []):
+        if not ticket.done():
+            pending.append((item, ticket))
+        elif ticket.exception() is not None:
+            messages.append(("error", f"앗! '{item}' 기록을 저장하지 못했어요. 다시 기록해 주세요. 🥺"))
+    st.session_state.expense_tickets = pending
+    return messages
+
+@st.fragment(key="expense_form")
+def expense_form():
     # 입력 폼
     # 학생이 스스로 Need(필요)와 Want(욕구)를 판단하여 입력하게 함으로써 메타인지 능력을 기른다.
     with st.form("input_form", clear_on_submit=True):
         col1, col2 = st.columns(2)
         with col1:
-            date = st.date_input("날짜", datetime.now())
-            item = st.text_input("내용", placeholder="예: 떡볶이, 용돈")
-            price = st.number_input("금액 (원)", min_value=0, step=100, format="%d")
+            st.date_input("날짜", datetime.now(), key="expense_date")
+            st.text_input("내용", placeholder="예: 떡볶이, 용돈", key="expense_item")
+            st.number_input("금액 (원)", min_value=0, step=100, format="%d", key="expense_price")
         with col2:
-            category = st.selectbox("어떤 종류인가요?", ["간식 🍪", "학용품 ✏️", "장난감 🤖", "교통비 🚌", "기타 🎸"])
-            is_need = st.radio("꼭 필요한 것이었나요?", ["필요해요 (Need) ✅", "원해요 (Want) 💖"], horizontal=True)
+            st.selectbox("어떤 종류인가요?", EXPENSE_CATEGORIES, key="expense_category")
+            st.radio("꼭 필요한 것이었나요?", EXPENSE_TYPES, horizontal=True, key="expense_type")
             
-        submitted = st.form_submit_button("기록하기 💾")
-        
-        if submitted:
-            if item and price > 0:
-                add_expense_db(st.session_state.username, date, item, price, category, is_need)
-                st.balloons()
-                st.success(f"💸 '{item}' 소비 기록 완료! 경험치 +10, 포인트 +10 획득! ✨")
-            else:
-                st.error("앗! 내용과 금액을 정확히 알려주세요. 🥺")
+        st.form_submit_button("기록하기 💾", on_click=on_expense_submit)
 
-    st.divider()
+    messages = st.session_state.pop("expense_messages", []) + expense_write_errors()
+    if messages and messages[0][0] == "success":
+        st.balloons()
+    for level, message in messages:
+        getattr(st, level)(message)
 
+@st.fragment(key="charts")
+def spending_overview():
     # 데이터 시각화 및 표
-    df_expense = get_expenses_db(st.session_state.username)
+    # 차트는 월간 요약 테이블의 종류/유형별 합계로 만들고, 새 기록이 들어오기 전까지는 캐시된 Figure를 다시 쓴다. (charts.py)
+    wait_for_user(st.session_state.username) # 방금 보낸 기록이 보이도록 (growth_panel과 같은 이유)
+    from charts import spending_charts
+    fig_pie, fig_bar = spending_charts(st.session_state.username)
     
     # 1. 컬럼 이름 확인 및 강제 통일
     column_map = {
-        'price': '금액', 'amount': '금액', 'cost': '금액',
+        'price': '금액', 'amount': '금액', 'cost': '금액', 'total': '금액',
         'category': '종류', 
         'type': '유형',
         'item': '내용', 'date': '날짜'
     }
-    df_expense = df_expense.rename(columns=column_map)
     
     # 2. 빈 데이터 방어 로직
-    if not df_expense.empty:
+    if fig_pie is not None:
         col_chart1, col_chart2 = st.columns(2)
         
         with col_chart1:
             st.markdown("#### 🍩 어디에 돈을 많이 썼을까?")
             # Plotly 도넛 차트를 통해 어떤 종류(간식 등)에 돈이 편중되었는지 직관적으로 보여준다.
-            fig1 = px.pie(df_expense, values="금액", names="종류", hole=0.4, color_discrete_sequence=px.colors.qualitative.Pastel)
-            st.plotly_chart(fig1, use_container_width=True)
+            with profiling.span("chart:pie"):
+                st.plotly_chart(fig_pie, width="stretch")
             
         with col_chart2:
             st.markdown("#### 📊 꼭 필요한 소비였을까?")
             # Plotly 막대 차트를 통해 Need와 Want의 비율을 한눈에 비교하여 합리적 소비 여부를 진단한다.
-            fig2 = px.bar(df_expense, x="유형", y="금액", color="유형", text_auto=True, color_discrete_map={"필요해요 (Need) ✅": "#4CAF50", "원해요 (Want) 💖": "#FF9800"})
-            st.plotly_chart(fig2, use_container_width=True)
+            with profiling.span("chart:bar"):
+                st.plotly_chart(fig_bar, width="stretch")
             
         st.markdown("#### 📋 지출 내역")
-        st.dataframe(df_expense[['날짜', '내용', '금액', '종류', '유형']], use_container_width=True)
+        # 전체 기록을 한꺼번에 불러오지 않고 HISTORY_PAGE_SIZE줄씩 넘겨 본다.
+        # history_cursors에는 지금까지 지나온 페이지의 시작 위치가 쌓인다. (첫 페이지는 None)
+        if "history_cursors" not in st.session_state:
+            st.session_state.history_cursors = [None]
+        df_page, next_cursor = get_expense_page(
+            st.session_state.username, after=st.session_state.history_cursors[-1], limit=HISTORY_PAGE_SIZE)
+        st.dataframe(df_page.rename(columns=column_map)[['날짜', '내용', '금액', '종류', '유형']], width="stretch")
+        
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        # 버튼 콜백에서 위치를 바꾸므로, 누른 뒤 이 조각이 한 번만 다시 실행되어 바로 새 페이지를 그린다.
+        with col_prev:
+            if len(st.session_state.history_cursors) > 1:
+                st.button("◀ 이전", key="history_prev", on_click=lambda: st.session_state.history_cursors.pop())
+        with col_page:
+            st.markdown(f"<div style='text-align:center;'>{len(st.session_state.history_cursors)} 페이지</div>", unsafe_allow_html=True)
+        with col_next:
+            if next_cursor is not None:
+                st.button("다음 ▶", key="history_next",
+                          on_click=lambda: st.session_state.history_cursors.append(next_cursor))
     else:
         st.info("아직 지출 기록이 없어요! 첫 기록을 남겨보세요. 🎈")
-        
-    # --- 월간 캘린더 리포트 ---
-    st.write("---")
-    st.subheader("📅 월간 캘린더 리포트")
-    
+
+@st.fragment(key="calendar")
+def month_report():
+    wait_for_user(st.session_state.username) # 방금 보낸 기록이 보이도록 (growth_panel과 같은 이유)
     # 날짜 선택
     now = datetime.now()
     col_y, col_m = st.columns(2)
@@ -444,98 +301,38 @@ with tab1:
     with col_m:
         month = st.selectbox("월", range(1, 13), index=now.month - 1, key="cal_month")
 
-    # 데이터 필터링
-    if not df_expense.empty:
-        df_expense['날짜'] = pd.to_datetime(df_expense['날짜'])
-        df_month_exp = df_expense[(df_expense['날짜'].dt.year == year) & (df_expense['날짜'].dt.month == month)]
-    else:
-        df_month_exp = pd.DataFrame()
+    # 분석용 열 묶음 (데이터 버전마다 한 번 만들어 캐시된다, expense_columns.py)
+    # 선택한 달, 비교할 지난달, 무지출 챌린지를 모두 정렬된 날짜에서 위치만 찾아 계산한다.
+    today_date = datetime.now().date()
+    month_start = datetime(year, month, 1).date()
+    month_end = datetime(year, month, calendar.monthrange(year, month)[1]).date()
+    prev_end = month_start - timedelta(days=1)
+    prev_start = prev_end.replace(day=1)
+    columns = get_expense_columns(st.session_state.username)
 
     # 3. 무지출 챌린지 연속 기록 계산 (간단 버전)
-    # 현재 달의 1일부터 오늘까지 지출 없는 날 계산한다.
     # 최근 지출 없는 날(No Spend Days)을 계산하여 절약 습관을 칭찬한다.
-    no_spend_streak = 0
-    today_date = datetime.now().date()
-    check_date = today_date
-    
-    # 최근 30일간 기록 확인
-    while True:
-        # 해당 날짜에 지출이 있는지 확인
-        day_spent = 0
-        if not df_expense.empty:
-            day_spent = df_expense[df_expense['날짜'].dt.date == check_date]['금액'].sum()
-        
-        if day_spent == 0:
-            no_spend_streak += 1
-            check_date -= timedelta(days=1)
-            if no_spend_streak > 30: break # 최대 30일까지만 체크
-        else:
-            break
-
-    # 캘린더 스타일
-    st.markdown("""
-    <style>
-    .day-box {
-        background-color: #ffffff;
-        border-radius: 15px;
-        padding: 5px;
-        height: 80px;
-        text-align: center;
-        box-shadow: 2px 2px 5px rgba(0,0,0,0.05);
-        margin-bottom: 10px;
-        font-size: 14px;
-        border: 2px solid #F0F0F0;
-    }
-    .day-num { font-weight: bold; color: #555; margin-bottom: 2px; }
-    .expense-text { color: #FF6B6B; font-weight: bold; font-size: 12px; }
-    .good-job { font-size: 24px; margin-top: 5px; }
-    .streak-banner { background-color: #E6E6FA; padding: 10px; border-radius: 10px; text-align: center; margin-bottom: 10px; color: #6A5ACD; font-weight: bold; }
-    </style>
-    """, unsafe_allow_html=True)
+    # 오늘부터 거꾸로 마지막으로 돈을 쓴 날까지 센다. (최대 31일)
+    no_spend_streak = columns.no_spend_streak(today_date)
 
     if no_spend_streak > 0:
         st.markdown(f"<div class='streak-banner'>🔥 현재 {no_spend_streak}일째 무지출 성공 중! 대단해요!</div>", unsafe_allow_html=True)
 
-    # 요일 헤더
-    cols = st.columns(7)
-    days_list = ["월", "화", "수", "목", "금", "토", "일"]
-    for i, day in enumerate(days_list):
-        cols[i].markdown(f"<div style='text-align: center; font-weight: bold; color: #555;'>{day}</div>", unsafe_allow_html=True)
-
     # 달력 그리기
     # HTML/CSS를 활용해 소비가 있는 날은 금액을, 없는 날은 '돼지 아이콘'을 표시하여 소비 패턴을 시각화한다.
-    cal = calendar.monthcalendar(year, month)
-    for week in cal:
-        cols = st.columns(7)
-        for i, day in enumerate(week):
-            with cols[i]:
-                if day == 0:
-                    st.markdown("<div class='day-box' style='background-color: transparent; border: none; box-shadow: none;'></div>", unsafe_allow_html=True)
-                else:
-                    current_date = datetime(year, month, day).date()
-                    daily_spent = 0
-                    if not df_month_exp.empty:
-                        daily_spent = df_month_exp[df_month_exp['날짜'].dt.date == current_date]['금액'].sum()
-                    
-                    content = f"<div class='day-num'>{day}</div>"
-                    if daily_spent > 0:
-                        content += f"<div class='expense-text'>💸 -{daily_spent:,}</div>"
-                    elif current_date <= datetime.now().date():
-                        content += "<div class='good-job'>🐷</div>" # 무지출 도장
-                    st.markdown(f"<div class='day-box'>{content}</div>", unsafe_allow_html=True)
+    # 한 달 전체를 HTML 한 덩어리로 만들어 한 번에 보낸다. (calendar_view.py, 새 기록이 들어오기 전까지 캐시)
+    with profiling.span("calendar"):
+        st.markdown(month_calendar_html(st.session_state.username, year, month, today_date), unsafe_allow_html=True)
 
     # 월말 결산 및 AI 분석
     st.markdown("### 📊 이번 달 결산")
-    total_exp_month = df_month_exp['금액'].sum() if not df_month_exp.empty else 0
+    total_exp_month = columns.range_total(month_start, month_end)
     
     st.metric("총 지출", f"{total_exp_month:,}원")
 
     st.info(f"💡 **AI 코치의 {month}월 분석:**")
     # 지난달 비교 로직
-    prev_date = datetime(year, month, 1) - timedelta(days=1)
-    prev_exp = 0
-    if not df_expense.empty:
-        prev_exp = df_expense[(df_expense['날짜'].dt.year == prev_date.year) & (df_expense['날짜'].dt.month == prev_date.month)]['금액'].sum()
+    prev_exp = columns.range_total(prev_start, prev_end)
     
     if prev_exp > 0:
         diff = total_exp_month - prev_exp
@@ -548,46 +345,64 @@ with tab1:
     else:
         st.write("지난달 기록이 없어서 비교할 수 없지만, 이번 달도 참 잘했어요!")
 
+def render_data_board():
+    st.subheader("📝 용돈기입장")
+    expense_form()
+
+    # 종이 용돈기입장을 옮겨 적은 파일을 한꺼번에 불러온다. (열: 날짜, 내용, 금액, 종류, 유형)
+    # 여러 날짜가 한꺼번에 바뀌므로 불러오기는 앱 전체를 다시 그린다. (보상은 줄마다가 아니라 묶음마다 한 번, importer.py)
+    with st.expander("📂 기입장 파일 한꺼번에 불러오기 (CSV/엑셀)"):
+        ledger_file = st.file_uploader("파일 선택", type=['csv', 'xlsx'], key="ledger_file")
+        if ledger_file and st.button("불러오기 📥"):
+            try:
+                report = import_expenses(ledger_file, ledger_file.name, st.session_state.username,
+                                         known_users={st.session_state.username})
+            except RuntimeError as e:
+                st.error(str(e))
+            else:
+                if report['inserted']:
+                    st.session_state.history_cursors = [None]
+                st.success(f"📥 {report['inserted']:,}줄을 불러왔어요! (초당 {report['rows_per_second']:,.0f}줄)")
+                if report['rejected']:
+                    st.warning(f"{len(report['rejected'])}줄은 형식이 맞지 않아 건너뛰었어요.")
+                    st.dataframe([{'줄 번호': line, '이유': reason} for line, reason in report['rejected']],
+                                 width="stretch")
+
+    st.divider()
+    spending_overview()
+
+    # --- 월간 캘린더 리포트 ---
+    st.write("---")
+    st.subheader("📅 월간 캘린더 리포트")
+    month_report()
+
 # --- Tab 2: AI 머니 코치 ---
-with tab2:
+def render_money_coach():
     st.subheader("🤖 AI 머니 코치")
-    df = get_expenses_db(st.session_state.username)
+    df = get_spending_summary(st.session_state.username)
     
     if df.empty:
         st.warning("아직 기록이 없어서 분석할 수 없어요. 🥺 '마이 데이터 보드'에 먼저 기록해주세요!")
     else:
         st.write("친구의 소비 습관을 보고 내가 칭찬이나 조언을 해줄게!")
         if st.button("AI 코치님, 분석해주세요! 🔍"):
-            
-            # 컬럼 이름 통일 (Tab 1과 동일하게)
-            df = df.rename(columns={'price': '금액', 'category': '종류', 'type': '유형', 'item': '내용', 'date': '날짜'})
-            
-            # 데이터 계산
-            total_spent = df['금액'].sum()
-            snack_spent = df[df['종류'] == '간식']['금액'].sum()
-            snack_ratio = (snack_spent / total_spent * 100) if total_spent > 0 else 0
-            
-            wants_amount = df[df['유형'] == '원해요 (Want) 💖']['금액'].sum()
-            needs_amount = df[df['유형'] == '필요해요 (Need) ✅']['금액'].sum()
+            # 규칙은 coach_rules.json에 있고, 분석용 열 묶음의 합계로 모든 규칙을 한 번에 판정한다. (coach.py)
+            from coach import analyze as analyze_spending
+            total_spent, feedback = analyze_spending(st.session_state.username, datetime.now().strftime('%Y-%m'))
 
             st.markdown(f"### 📊 분석 결과 (총 소비: {total_spent:,}원)")
             # Rule-based 알고리즘을 사용해 간식비 40% 초과 등 특정 조건 만족 시 맞춤형 피드백을 제공한다.
             # 초등학생이 이해하기 쉽도록 색상 카드(초록/빨강)와 아이콘으로 즉각적인 피드백을 준다.
-
-            # Rule 1: 간식 비율 체크
-            if snack_ratio > 40:
-                st.warning(f"🍪 **간식 경보!** 간식비가 전체의 {snack_ratio:.1f}%를 차지해요. 군것질 비율이 너무 높아요! 건강과 지갑을 위해 조금만 줄여볼까요?")
-            else:
-                st.success(f"🍎 **아주 좋아요!** 간식비 비율이 {snack_ratio:.1f}%로 적절해요.")
-
-            # Rule 2: Needs vs Wants 체크
-            if wants_amount > needs_amount:
-                st.error("💸 **지출 주의!** '원해요(Want)'에 쓴 돈이 '필요해요(Need)'보다 많아요. 꼭 필요하지 않은 물건을 너무 많이 샀어요. 신중한 선택이 필요해요!")
-            else:
-                st.success("⚖️ **훌륭해요!** 꼭 필요한 곳에 돈을 잘 쓰고 있군요. 합리적인 소비 습관입니다!")
+            for level, message in feedback:
+                getattr(st, level)(message)
 
 # --- Tab 3: 소비 밸런스 게임 ---
-with tab3:
+def reset_balance_game():
+    del st.session_state.current_scenario
+    st.session_state.game_choice = None
+
+@st.fragment(key="balance_game")
+def render_balance_game():
     st.subheader("⚖️ 소비 밸런스 게임")
     st.write("현명한 선택을 하는 연습을 해봅시다!")
     # 학생들의 흥미를 끌 수 있는 딜레마 시나리오를 정의한다.
@@ -669,13 +484,11 @@ with tab3:
         if reason:
             st.balloons()
             st.success("🎉 **미션 완료!** 자신의 생각을 멋지게 설명했네! 참 잘했어! 💯")
-            if st.button("다른 문제 풀기 🔄"):
-                del st.session_state.current_scenario
-                st.session_state.game_choice = None
-                st.rerun()
+            # 콜백에서 문제를 비우므로, 누른 뒤 이 조각이 다시 실행되면서 바로 새 문제를 고른다.
+            st.button("다른 문제 풀기 🔄", on_click=reset_balance_game)
 
 # --- Tab 4: 내 꿈 저금통 ---
-with tab4:
+def render_wishlist():
     st.subheader("🎋 내 꿈 저금통 (Wish List)")
     
     st.write("갖고 싶은 물건을 등록하고 목표를 세워보세요!")
@@ -688,12 +501,12 @@ with tab4:
         # 목표가 있을 때
         item_name = wish[2]
         target_price = wish[3]
-        image_data = wish[4]
+        image_hash = wish[4]
         
         col_goal1, col_goal2 = st.columns([1, 2])
         with col_goal1:
-            if image_data:
-                st.image(image_data, caption=item_name, use_container_width=True)
+            if image_hash:
+                st.image(thumbnail_path(image_hash), caption=item_name, width="stretch")
             else:
                 st.markdown(f"<div style='font-size:100px; text-align:center;'>🎁</div>", unsafe_allow_html=True)
         
@@ -724,7 +537,7 @@ with tab4:
                     st.error("물건 이름과 가격을 입력해주세요.")
 
 # --- Tab 5: 나의 트로피 ---
-with tab5:
+def render_trophies():
     st.subheader("🏆 나의 트로피 (명예의 전당)")
     st.write("열심히 활동해서 멋진 배지를 모아보세요!")
     
@@ -763,11 +576,20 @@ with tab5:
             """, unsafe_allow_html=True)
 
 # --- Tab 6: 랭킹 (명예의 전당) ---
-with tab6:
+def render_ranking():
     st.subheader("🏆 우리 반 명예의 전당")
     st.write("누가누가 절약 포인트를 많이 모았을까요?")
     
-    leaderboard_df = get_leaderboard()
+    # 반을 적은 학생은 우리 반 안에서, 아니면 학교 전체에서 순위를 매긴다.
+    # 전체 순위는 반별 DB(샤드)에 나뉘어 있는 모든 학교의 순위를 합친 것이다.
+    my_class = get_user_class(st.session_state.username) or None
+    if my_class and st.toggle("🌏 모든 학교 랭킹 보기", key="ranking_all_schools"):
+        my_class = None
+    leaderboard_df = get_leaderboard(my_class)
+    my_rank, group_size = get_my_rank(st.session_state.username, my_class)
+    if my_rank:
+        group_label = f"{my_class}반" if my_class else "전체"
+        st.markdown(f"**🙋 나의 순위:** {group_label} {group_size}명 중 **{my_rank}위**")
     
     if not leaderboard_df.empty:
         # 포인트가 높은 상위 친구들의 명단을 카드로 보여주어 건전한 경쟁과 사회적 학습을 유도한다.
@@ -795,3 +617,36 @@ with tab6:
             """, unsafe_allow_html=True)
     else:
         st.info("아직 랭킹 데이터가 없어요. 친구들을 초대해보세요!")
+
+# 선택한 화면만 실행
+SECTION_RENDERERS = dict(zip(SECTIONS, [
+    render_data_board, render_money_coach, render_balance_game,
+    render_wishlist, render_trophies, render_ranking,
+]))
+with profiling.span(f"section:{section}"):
+    SECTION_RENDERERS[section]()
+
+with growth_slot:
+    growth_panel()
+
+# 계측 결과 정리: 구조화된 로그(JSON)로 남기고, 관리자 패널에 최근 결과를 보여준다.
+profile_result = profiling.finish_run()
+if profile_panel is not None:
+    if profile_result:
+        st.session_state.profile_log = (st.session_state.get("profile_log", []) + [profile_result])[-50:]
+    with profile_panel.container():
+        if profile_result:
+            col_a, col_b, col_c = st.columns(3)
+            col_a.metric("재실행", f"{profile_result['total_ms']:.0f}ms")
+            col_b.metric("SQL", profile_result['queries'])
+            col_c.metric("읽은 줄", profile_result['rows'])
+            st.dataframe(
+                [{"구간": name, "호출": s['calls'], "ms": s['ms']} for name, s in profile_result['spans'].items()],
+                hide_index=True, width="stretch")
+        st.json({"cache": cache_stats(), "db_pool": pool_stats(), "write_queue": write_queue_stats(),
+                 "startup_ms": profiling.startup_stats()}, expanded=False)
+        if st.session_state.get("profile_log"):
+            st.download_button(
+                "계측 로그 내려받기 (JSON Lines)",
+                "\n".join(json.dumps(r, ensure_ascii=False) for r in st.session_state.profile_log),
+                file_name="money_manager_profile.jsonl", mime="application/json")
@@ -0,0 +1,161 @@
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import database
+
+# 소비 기록 쓰기 대기열 (write-behind).
+# 반 전체가 동시에 '기록하기'를 누르면 여러 스레드가 SQLite 쓰기 잠금을 두고 다투다 'database is locked'로 멈춘다.
+# 그래서 쓰기는 백그라운드 스레드 하나가 대기열에서 꺼내 모아서(group commit) 한 트랜잭션으로 저장하고,
+# 화면 쪽은 대기열에 넣자마자 바로 '기록 완료'를 보여준다.
+# 같은 학생의 화면은 읽기 전에 wait_for_user()로 자기 기록이 저장될 때까지 기다리므로, 방금 쓴 기록이 반드시 보인다.
+
+MAX_BATCH = 200        # 한 트랜잭션에 모을 최대 기록 수
+MAX_WAIT = 0.01        # 첫 기록이 들어온 뒤 더 모으기 위해 기다리는 시간(초)
+LOCK_RETRIES = 3       # 'database is locked'일 때 다시 시도하는 횟수
+
+
+class WriteBehindQueue:
+
+    def __init__(self, writer=None, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        # writer(rows)는 기록 묶음을 한 트랜잭션으로 저장하고 {username: 새 (스트릭, XP, 포인트)}를 돌려준다.
+        # 일부만 저장되었으면 database.PartialWriteError로 저장되지 않은 줄을 알린다. (add_expenses_bulk)
+        self._writer = writer or database.add_expenses_bulk
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._pending = {}  # username -> 아직 저장되지 않은 기록 수
+        self._cond = threading.Condition()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='money-manager-writer', daemon=True)
+                self._thread.start()
+
+    def submit_expense(self, username, date, item, price, category, type_val):
+        # 소비 기록을 대기열에 넣고 바로 돌아온다. 저장이 끝나면 Future에 새 (스트릭, XP, 포인트)가 들어간다.
+        future = Future()
+        with self._cond:
+            self._pending[username] = self._pending.get(username, 0) + 1
+        self._ensure_started()
+        self._queue.put(((username, date, item, price, category, type_val), future))
+        return future
+
+    def wait_for_user(self, username, timeout=5.0):
+        # 이 학생이 보낸 기록이 모두 저장될 때까지 기다린다. (다른 학생의 기록은 기다리지 않는다)
+        # 시간 안에 끝나면 True
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending.get(username):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def flush(self, timeout=10.0):
+        # 대기열 전체가 저장될 때까지 기다린다. (프로세스 종료, 테스트용)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while any(self._pending.values()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._cond:
+            pending = sum(self._pending.values())
+        return {'batches': self.batches, 'written': self.written, 'failed': self.failed, 'pending': pending}
+
+    def _take_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, rows):
+        # rows를 저장하고 {username: 새 (스트릭, XP, 포인트)}를 돌려준다.
+        # 실패하면 database.PartialWriteError(저장된 사용자의 통계, 저장되지 않은 줄의 위치)를 낸다.
+        # 'database is locked'면 잠시 뒤 아직 저장되지 않은 줄만 다시 보낸다. (샤드마다 따로 커밋하므로
+        # 이미 저장된 샤드의 줄을 다시 보내면 기록과 보상이 두 번 들어간다)
+        stats = {}
+        left = list(range(len(rows)))
+        for attempt in range(LOCK_RETRIES + 1):
+            try:
+                stats.update(self._writer([rows[i] for i in left]))
+                return stats
+            except database.PartialWriteError as e:
+                stats.update(e.stats)
+                left = [left[i] for i in e.failed]
+                error = e.__cause__ or e
+            except Exception as e:
+                error = e
+            if not isinstance(error, sqlite3.OperationalError) or 'locked' not in str(error) or attempt == LOCK_RETRIES:
+                raise database.PartialWriteError(stats, left) from error
+            time.sleep(0.05 * (2 ** attempt))
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            rows = [row for row, _ in batch]
+            try:
+                stats, failed = self._write(rows), set()
+            except database.PartialWriteError as e:
+                stats, failed = e.stats, set(e.failed)
+            results = []
+            for i, (row, future) in enumerate(batch):
+                if i not in failed:
+                    results.append((future, stats.get(row[0]), None))
+                    continue
+                # 저장되지 않은 줄만 한 줄씩 따로 저장해서, 잘못된 한 줄 때문에 다른 학생의 기록이 사라지지 않게 한다.
+                try:
+                    results.append((future, self._write([row]).get(row[0]), None))
+                except database.PartialWriteError as e:
+                    results.append((future, None, e.__cause__ or e))
+            self.batches += 1
+            for (row, _), (future, result, error) in zip(batch, results):
+                if error is None:
+                    self.written += 1
+                    future.set_result(result)
+                else:
+                    self.failed += 1
+                    future.set_exception(error)
+                with self._cond:
+                    self._pending[row[0]] -= 1
+                    if not self._pending[row[0]]:
+                        del self._pending[row[0]]
+                    self._cond.notify_all()
+
+
+_write_queue = WriteBehindQueue()
+atexit.register(_write_queue.flush)
+
+
+def submit_expense(username, date, item, price, category, type_val):
+    return _write_queue.submit_expense(username, date, item, price, category, type_val)
+
+
+def wait_for_user(username, timeout=5.0):
+    return _write_queue.wait_for_user(username, timeout)
+
+
+def write_queue_stats():
+    return _write_queue.stats()